@@ -116,11 +116,22 @@ def init_students_and_attendance_tables():
             email TEXT,
             photo_path TEXT,
             encoding_path TEXT,
-            date_registered TEXT NOT NULL
+            date_registered TEXT NOT NULL,
+            department TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1
         )
         """
     )
 
+    cursor.execute("PRAGMA table_info(students)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "department" not in columns:
+        cursor.execute("ALTER TABLE students ADD COLUMN department TEXT")
+    if "is_active" not in columns:
+        cursor.execute(
+            "ALTER TABLE students ADD COLUMN is_active INTEGER NOT NULL DEFAULT 1"
+        )
+
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS attendance (
@@ -6,7 +6,8 @@ def list_students():
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT id, student_id, name, COALESCE(email,'' ) AS email, COALESCE(date_registered,'') AS date_registered
+            SELECT id, student_id, name, COALESCE(email,'' ) AS email, COALESCE(date_registered,'') AS date_registered,
+                   department, COALESCE(is_active, 1) AS is_active
             FROM students
             WHERE 1=1
             ORDER BY date_registered ASC
@@ -21,7 +22,8 @@ def get_student_by_student_id(student_id: str):
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT id, student_id, name, COALESCE(email,'' ) AS email, COALESCE(date_registered,'') AS date_registered
+            SELECT id, student_id, name, COALESCE(email,'' ) AS email, COALESCE(date_registered,'') AS date_registered,
+                   department, COALESCE(is_active, 1) AS is_active
             FROM students
             WHERE student_id = ?
             """,
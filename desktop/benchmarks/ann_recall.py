@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ann_index import IVFIndex, sync_index
+from core.gallery import ENCODING_DIM, GalleryMatcher
+from benchmarks.gallery_modes import synthetic_students
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall and latency of the IVF index against exact search"
+    )
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument(
+        "--probes", type=str, default="1,2,4,8,16,32,64", help="comma separated"
+    )
+    args = parser.parse_args()
+
+    students_data = synthetic_students(args.students, args.samples)
+    matcher = GalleryMatcher.from_students(students_data)
+
+    rng = np.random.default_rng(2)
+    picks = rng.integers(0, len(students_data), args.queries)
+    queries = np.stack(
+        [
+            np.atleast_2d(students_data[i]["encoding"])[rng.integers(args.samples)]
+            + rng.normal(0.0, 0.02, ENCODING_DIM)
+            for i in picks
+        ]
+    ).astype(np.float32)
+
+    start = time.perf_counter()
+    for query in queries:
+        matcher.match(query)
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+    exact_idx, _, _ = matcher.match(queries)
+
+    start = time.perf_counter()
+    if args.lists:
+        index = IVFIndex.train(matcher.matrix, n_lists=args.lists)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = sync_index(matcher, os.path.join(tmp, "index.npz"))
+    build_s = time.perf_counter() - start
+    matcher.attach_index(index)
+
+    print(
+        f"{len(matcher)} students, {matcher.sample_count} rows, "
+        f"{index.n_lists} lists, built in {build_s:.2f}s"
+    )
+    print(f"exact scan: {exact_ms:.3f} ms/query")
+    print(
+        f"{'n_probe':>7} {'recall@1':>9} {'ms/query':>9} {'speedup':>8} {'scanned':>8}"
+    )
+    for n_probe in [int(p) for p in args.probes.split(",")]:
+        start = time.perf_counter()
+        ann_idx = np.empty(len(queries), dtype=np.intp)
+        for i, query in enumerate(queries):
+            ann_idx[i] = matcher.match(query, n_probe=n_probe)[0][0]
+        ann_ms = (time.perf_counter() - start) / len(queries) * 1000
+        recall = np.mean(ann_idx == exact_idx)
+        scanned = min(n_probe, index.n_lists) / index.n_lists
+        print(
+            f"{n_probe:>7} {recall:>9.4f} {ann_ms:>9.3f} "
+            f"{exact_ms / ann_ms:>7.1f}x {scanned:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
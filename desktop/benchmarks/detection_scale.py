@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import detect_faces, encode_faces
+from core.tracker import box_iou
+from benchmarks.pipeline_scaling import load_frames
+
+
+def run_scale(frames, scale, detection_model):
+    detect_seconds = 0.0
+    encode_seconds = 0.0
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        boxes = detect_faces(frame, detection_model, scale)
+        detect_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        encodings = encode_faces(frame, boxes) if boxes else []
+        encode_seconds += time.perf_counter() - start
+        results.append((boxes, np.asarray(encodings, dtype=np.float32)))
+    return detect_seconds, encode_seconds, results
+
+
+def compare(reference, results):
+    # faces found at full resolution that this scale also found, and how far
+    # their encodings moved because the box came from the smaller image
+    found, total, drift = 0, 0, []
+    for (ref_boxes, ref_encs), (boxes, encs) in zip(reference, results):
+        total += len(ref_boxes)
+        for i, ref_box in enumerate(ref_boxes):
+            overlaps = [box_iou(ref_box, box) for box in boxes]
+            if overlaps and max(overlaps) >= 0.5:
+                found += 1
+                j = int(np.argmax(overlaps))
+                drift.append(float(np.linalg.norm(ref_encs[i] - encs[j])))
+    recall = found / total if total else float("nan")
+    return recall, max(drift) if drift else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detection FPS and accuracy by detection downscale factor"
+    )
+    parser.add_argument(
+        "--source", help="video file or directory of images (ideally with faces)"
+    )
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--scales", default="1.0,0.75,0.5,0.33,0.25")
+    parser.add_argument("--detection-model", default="hog")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.width, args.height))
+    scales = [float(s) for s in args.scales.split(",")]
+    if scales[0] != 1.0:
+        scales.insert(0, 1.0)
+    print(f"{len(frames)} frames at {args.width}x{args.height}")
+    print(
+        f"{'scale':>5} {'detect ms':>9} {'encode ms':>9} {'FPS':>6} "
+        f"{'faces':>6} {'recall':>7} {'max drift':>9}"
+    )
+    reference = None
+    for scale in scales:
+        detect_seconds, encode_seconds, results = run_scale(
+            frames, scale, args.detection_model
+        )
+        if reference is None:
+            reference = results
+        recall, drift = compare(reference, results)
+        faces = sum(len(boxes) for boxes, _ in results)
+        fps = len(frames) / (detect_seconds + encode_seconds)
+        print(
+            f"{scale:>5.2f} {detect_seconds / len(frames) * 1000:>9.1f} "
+            f"{encode_seconds / len(frames) * 1000:>9.1f} {fps:>6.1f} "
+            f"{faces:>6} {recall:>7.0%} {drift:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
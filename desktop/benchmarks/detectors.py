@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import DETECTORS
+from core.tracker import box_iou
+from benchmarks.detection_scale import run_scale
+from benchmarks.pipeline_scaling import load_frames
+
+MATCH_IOU = 0.5
+
+
+def score(reference, results):
+    # a box is a hit when it overlaps a reference box; recall is over the
+    # reference faces, precision over the boxes this backend returned, and
+    # drift is how far a hit's encoding moved from the reference encoding
+    hits, total, found, drift = 0, 0, 0, []
+    for (ref_boxes, ref_encs), (boxes, encs) in zip(reference, results):
+        total += len(ref_boxes)
+        found += len(boxes)
+        for j, box in enumerate(boxes):
+            overlaps = [box_iou(box, ref_box) for ref_box in ref_boxes]
+            if overlaps and max(overlaps) >= MATCH_IOU:
+                hits += 1
+                i = int(np.argmax(overlaps))
+                drift.append(float(np.linalg.norm(ref_encs[i] - encs[j])))
+    recall = min(hits, total) / total if total else float("nan")
+    precision = hits / found if found else float("nan")
+    return recall, precision, max(drift) if drift else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Speed and recall of each face detection backend"
+    )
+    parser.add_argument(
+        "--source", help="video file or directory of images (ideally with faces)"
+    )
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument(
+        "--backends",
+        default="hog,haar,haar+hog",
+        help=f"comma-separated, first is the reference; any of {','.join(DETECTORS)}",
+    )
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.width, args.height))
+    backends = args.backends.split(",")
+    print(
+        f"{len(frames)} frames at {args.width}x{args.height}, detection scale "
+        f"{args.detection_scale}, compared with {backends[0]}"
+    )
+    print(
+        f"{'backend':<9} {'detect ms':>9} {'speedup':>8} {'faces':>6} "
+        f"{'recall':>7} {'precision':>9} {'max drift':>9}"
+    )
+    reference = None
+    for backend in backends:
+        detect_seconds, _, results = run_scale(frames, args.detection_scale, backend)
+        if reference is None:
+            reference, reference_seconds = results, detect_seconds
+        recall, precision, drift = score(reference, results)
+        faces = sum(len(boxes) for boxes, _ in results)
+        print(
+            f"{backend:<9} {detect_seconds / len(frames) * 1000:>9.1f} "
+            f"{reference_seconds / detect_seconds:>7.2f}x {faces:>6} "
+            f"{recall:>7.0%} {precision:>9.0%} {drift:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import detect_and_encode
+from core.display import DISPLAY_FPS, WINDOW_NAME, SessionDisplay
+from core.tracker import FaceTracker
+from benchmarks.pipeline_scaling import load_frames
+
+HUD = {
+    "roster_label": "Benchmark",
+    "students": 0,
+    "marked": 0,
+    "dropped": 0,
+    "quality": "benchmark",
+}
+
+
+def recognize(frames, detection_model, scale, display=None, inline=None):
+    # the session loop's work per frame; inline(display) draws and shows the
+    # frame in the loop itself, the way the session used to
+    tracker = FaceTracker()
+    for frame_rgb, frame_bgr in frames:
+        boxes, _, _ = detect_and_encode(
+            frame_rgb,
+            detection_model,
+            scale,
+            skip_boxes=tracker.confirmed_boxes(),
+            max_encodings=2,
+            waiting=tracker.waiting_boxes(),
+        )
+        tracks = tracker.update(boxes)
+        if display is not None:
+            display.publish(frame_bgr, tracks, HUD)
+            if inline is not None:
+                inline(display)
+
+
+def show(display, window):
+    preview = display.render()
+    if preview is not None and window:
+        cv2.imshow(WINDOW_NAME, preview)
+        cv2.waitKey(1)
+
+
+def run(frames, mode, detection_model, scale, window):
+    display = None if mode == "headless" else SessionDisplay()
+    start = time.perf_counter()
+    if mode == "threaded":
+        # recognition in its own thread, the display redrawing at its own rate
+        worker = threading.Thread(
+            target=recognize, args=(frames, detection_model, scale, display)
+        )
+        worker.start()
+        while worker.is_alive():
+            show(display, window)
+            time.sleep(1.0 / DISPLAY_FPS)
+        worker.join()
+    else:
+        inline = None
+        if mode == "inline":
+            inline = lambda d: show(d, window)
+        recognize(frames, detection_model, scale, display, inline)
+    seconds = time.perf_counter() - start
+    return len(frames) / seconds, display.rendered / seconds if display else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recognition throughput with the preview drawn inline, on its "
+        "own thread, or not at all"
+    )
+    parser.add_argument("--source", help="video file or directory of images")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument("--detection-model", default="hog")
+    parser.add_argument(
+        "--no-window",
+        action="store_true",
+        help="draw the preview without showing it, e.g. without a display",
+    )
+    args = parser.parse_args()
+
+    frames = [
+        (frame, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        for frame in load_frames(args.source, args.frames, (args.width, args.height))
+    ]
+    # loads the models outside the timings
+    detect_and_encode(frames[0][0], args.detection_model, args.detection_scale)
+    print(f"{len(frames)} frames at {args.width}x{args.height}")
+    print(f"{'display':<9} {'recognized/s':>12} {'redrawn/s':>10}")
+    for mode in ("inline", "threaded", "headless"):
+        recognized, redrawn = run(
+            frames,
+            mode,
+            args.detection_model,
+            args.detection_scale,
+            not args.no_window,
+        )
+        print(f"{mode:<9} {recognized:>12.1f} {redrawn:>10.1f}")
+    if not args.no_window:
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import mirror_box
+from core.motion import MOTION_PIXEL_DELTA, MOTION_THUMBNAIL_SIZE, MotionGate
+from benchmarks.pipeline_scaling import load_frames
+
+# a face box that is drawn on every frame, as a track would be
+BOX_FRACTION = (0.25, 0.6, 0.75, 0.4)
+
+
+class AllocatingPath:
+    # the session loop as it was: mirror the camera frame, convert the
+    # mirrored frame for detection, thumbnail it with fresh arrays, and draw
+    # on the mirrored frame
+    def __init__(self, slot):
+        self.slot = slot
+        self.reference = None
+
+    def __call__(self, frame_bgr, box):
+        frame_bgr = cv2.flip(frame_bgr, 1)
+        small = cv2.resize(
+            frame_bgr, MOTION_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.GaussianBlur(gray, (3, 3), 0)
+        if self.reference is not None:
+            diff = cv2.absdiff(thumbnail, self.reference)
+            cv2.countNonZero(
+                cv2.threshold(diff, MOTION_PIXEL_DELTA, 255, cv2.THRESH_BINARY)[1]
+            )
+        self.reference = thumbnail
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        if self.slot is not None:
+            np.copyto(self.slot, frame_rgb)
+        top, right, bottom, left = box
+        cv2.rectangle(frame_bgr, (left, top), (right, bottom), (0, 255, 0), 2)
+        return frame_bgr
+
+
+class BufferedPath:
+    # the session loop now: detection reads the camera frame as is, straight
+    # into the pipeline slot or a reused RGB buffer, and only the displayed
+    # copy is mirrored, into a reused buffer
+    def __init__(self, slot):
+        self.slot = slot
+        self.gate = MotionGate(force_every=10**9)
+        self.frame_rgb = None
+        self.display = None
+
+    def __call__(self, frame_bgr, box):
+        self.gate.check(frame_bgr)
+        if self.slot is not None:
+            cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self.slot)
+        else:
+            self.frame_rgb = cv2.cvtColor(
+                frame_bgr, cv2.COLOR_BGR2RGB, dst=self.frame_rgb
+            )
+        self.display = cv2.flip(frame_bgr, 1, dst=self.display)
+        top, right, bottom, left = mirror_box(box, frame_bgr.shape[1])
+        cv2.rectangle(self.display, (left, top), (right, bottom), (0, 255, 0), 2)
+        return self.display
+
+
+def run(path, frames, box):
+    # warm-up allocates whatever the path keeps across frames
+    for frame in frames[:2]:
+        path(frame, box)
+
+    start = time.perf_counter()
+    for frame in frames:
+        path(frame, box)
+    seconds = (time.perf_counter() - start) / len(frames)
+
+    # timed and traced separately: tracing slows every allocation down
+    peaks = []
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        path(frame, box)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return seconds, float(np.mean(peaks))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-frame allocations and time of the session's frame path"
+    )
+    parser.add_argument("--source", help="video file or directory of images")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    frames = [
+        cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        for frame in load_frames(args.source, args.frames, (args.width, args.height))
+    ]
+    h, w = frames[0].shape[:2]
+    box = (
+        int(BOX_FRACTION[0] * h),
+        int(BOX_FRACTION[1] * w),
+        int(BOX_FRACTION[2] * h),
+        int(BOX_FRACTION[3] * w),
+    )
+    # stands in for a shared-memory slot of the recognition pipeline
+    slot = np.empty((h, w, 3), dtype=np.uint8)
+
+    print(f"{len(frames)} frames at {w}x{h}")
+    print(f"{'mode':<9} {'path':<11} {'ms/frame':>9} {'KiB/frame':>10}")
+    for mode, mode_slot in (("inline", None), ("pipeline", slot)):
+        for name, path in (
+            ("allocating", AllocatingPath(mode_slot)),
+            ("buffered", BufferedPath(mode_slot)),
+        ):
+            seconds, allocated = run(path, frames, box)
+            print(
+                f"{mode:<9} {name:<11} {seconds * 1000:>9.2f} "
+                f"{allocated / 1024:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.gallery import ENCODING_DIM, GalleryMatcher
+
+
+def synthetic_students(n_students, samples_per_student, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.09, size=(n_students, ENCODING_DIM))
+    students_data = []
+    for i, center in enumerate(centers):
+        samples = center + rng.normal(0.0, 0.025, (samples_per_student, ENCODING_DIM))
+        students_data.append(
+            {"student_id": f"S{i:06d}", "name": f"Student {i}", "encoding": samples}
+        )
+    return students_data
+
+
+def as_mean_mode(students_data):
+    return [
+        {**student, "encoding": np.atleast_2d(student["encoding"]).mean(axis=0)}
+        for student in students_data
+    ]
+
+
+def time_matching(matcher, queries, repeats):
+    matcher.match(queries)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        matcher.match(queries)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare mean-only and multi-sample gallery matching"
+    )
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--faces", type=int, default=4, help="faces per frame")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument(
+        "--db", action="store_true", help="use the registered students instead"
+    )
+    args = parser.parse_args()
+
+    if args.db:
+        import sqlite3
+
+        from core.attendance import DB_PATH
+        from core.encoding_store import load_encoded_gallery
+
+        conn = sqlite3.connect(DB_PATH)
+        matcher = load_encoded_gallery(conn.cursor())
+        conn.close()
+        blocks = np.split(matcher.matrix, np.cumsum(matcher.sample_counts())[:-1])
+        students_data = [
+            {"student_id": student_id, "name": name, "encoding": block}
+            for student_id, name, block in zip(matcher.ids, matcher.names, blocks)
+        ]
+    else:
+        students_data = synthetic_students(args.students, args.samples)
+    if not students_data:
+        print("No students to benchmark.")
+        return
+
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, len(students_data), args.faces)
+    queries = np.stack(
+        [
+            np.atleast_2d(students_data[i]["encoding"])[0]
+            + rng.normal(0.0, 0.02, ENCODING_DIM)
+            for i in picks
+        ]
+    )
+
+    print(f"{'mode':<8} {'students':>9} {'rows':>9} {'KiB':>9} {'ms/frame':>9}")
+    for mode, data in (
+        ("mean", as_mean_mode(students_data)),
+        ("samples", students_data),
+    ):
+        matcher = GalleryMatcher.from_students(data)
+        seconds = time_matching(matcher, queries, args.repeats)
+        print(
+            f"{mode:<8} {len(matcher):>9} {matcher.sample_count:>9} "
+            f"{matcher.nbytes / 1024:>9.0f} {seconds * 1000:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
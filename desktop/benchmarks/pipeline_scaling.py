@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pipeline import RecognitionPipeline
+
+
+def load_frames(source, count, size):
+    frames = []
+    if source and os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                frames.append(image)
+    elif source:
+        cap = cv2.VideoCapture(source)
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        # no faces in noise, so this measures detection only
+        print("No --source given: timing detection on synthetic frames")
+        rng = np.random.default_rng(0)
+        frames = [
+            rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+            for _ in range(min(count, 8))
+        ]
+    frames = [
+        cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB) for frame in frames
+    ]
+    return [frames[i % len(frames)] for i in range(count)]
+
+
+def run_pipeline(frames, workers, detection_model):
+    with RecognitionPipeline(workers, detection_model=detection_model) as pipeline:
+        if not pipeline.wait_ready():
+            raise RuntimeError(f"{workers} workers did not start")
+        # warm-up so every worker has allocated dlib's buffers
+        for frame in frames[:workers]:
+            pipeline.submit(frame)
+        while pipeline.pending():
+            pipeline.results(timeout=0.05)
+
+        order = []
+        faces = 0
+        submitted = 0
+        start = time.perf_counter()
+        while len(order) < len(frames):
+            while submitted < len(frames) and pipeline.has_free_slot():
+                pipeline.submit(frames[submitted], submitted)
+                submitted += 1
+            for seq, boxes, _, _ in pipeline.results(timeout=0.05):
+                order.append(seq)
+                faces += len(boxes)
+        seconds = time.perf_counter() - start
+    return seconds, faces, order == list(range(len(frames)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput of the recognition pipeline by worker count"
+    )
+    parser.add_argument(
+        "--source", help="video file or directory of images (ideally with faces)"
+    )
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument(
+        "--workers",
+        default="1,2,4",
+        help="comma-separated worker counts, e.g. 1,2,4,8",
+    )
+    parser.add_argument("--detection-model", default="hog")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.width, args.height))
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"{len(frames)} frames at {args.width}x{args.height}, {os.cpu_count()} CPUs")
+    print(
+        f"{'workers':>7} {'frames/s':>9} {'faces/s':>8} {'speedup':>8} "
+        f"{'efficiency':>10} {'ordered':>8}"
+    )
+    baseline = None
+    for workers in counts:
+        seconds, faces, ordered = run_pipeline(frames, workers, args.detection_model)
+        fps = len(frames) / seconds
+        if baseline is None:
+            baseline = fps / counts[0]
+        speedup = fps / baseline
+        print(
+            f"{workers:>7} {fps:>9.1f} {faces / seconds:>8.1f} {speedup:>7.2f}x "
+            f"{speedup / workers:>10.0%} {'yes' if ordered else 'NO':>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
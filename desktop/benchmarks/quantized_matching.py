@@ -0,0 +1,122 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.gallery import ENCODING_DIM, PRECISIONS, GalleryMatcher
+from core.gallery_cache import read_packed_gallery, write_packed_gallery
+from benchmarks.gallery_modes import synthetic_students
+
+FINGERPRINT = "quantized-matching-benchmark"
+
+
+def decisions(matcher, queries, tolerance):
+    best_idx, best_dist, _ = matcher.match(queries)
+    return np.where(best_dist <= tolerance, best_idx, -1), best_dist
+
+
+def memory_kib():
+    # (private, mapped) KiB this process has resident: anonymous memory only
+    # it can hold, and file pages such as the mapped gallery cache, which the
+    # OS can drop and share. Linux only
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    rss = int(fields["Rss"].split()[0])
+    anonymous = int(fields["Anonymous"].split()[0])
+    return anonymous, rss - anonymous
+
+
+def measure(task):
+    # runs in a fresh process per precision, loading the gallery the way a
+    # session does: memory-mapped from the packed cache
+    path, precision, frames, queries, tolerance = task
+    before = memory_kib()
+    matcher = read_packed_gallery(path, FINGERPRINT, precision)
+    matcher.match(frames[0])
+    start = time.perf_counter()
+    for frame in frames:
+        matcher.match(frame)
+    seconds = (time.perf_counter() - start) / len(frames)
+    decided, dists = decisions(matcher, queries, tolerance)
+    after = memory_kib()
+    memory = None
+    if before is not None and after is not None:
+        memory = (after[0] - before[0], after[1] - before[1])
+    return matcher.nbytes, memory, seconds, decided, dists
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memory, throughput and decision drift of quantized galleries"
+    )
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--faces", type=int, default=4, help="faces per frame")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.6, help="attendance TOLERANCE"
+    )
+    args = parser.parse_args()
+
+    students_data = synthetic_students(args.students, args.samples)
+    rng = np.random.default_rng(5)
+    # genuine faces at a spread of distances plus impostors, so some queries
+    # land close to the tolerance where quantization error could flip them
+    picks = rng.integers(0, len(students_data), args.queries)
+    noise = rng.uniform(0.01, 0.07, args.queries)[:, None]
+    queries = (
+        np.stack([np.atleast_2d(students_data[i]["encoding"])[0] for i in picks])
+        + rng.normal(0.0, 1.0, (args.queries, ENCODING_DIM)) * noise
+    )
+    impostors = rng.normal(0.0, 0.09, (args.queries // 4, ENCODING_DIM))
+    queries = np.concatenate([queries, impostors]).astype(np.float32)
+    frames = [queries[i : i + args.faces] for i in range(0, len(queries), args.faces)]
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "gallery_cache.bin")
+    write_packed_gallery(path, GalleryMatcher.from_students(students_data), FINGERPRINT)
+    del students_data
+
+    reference = None
+    print(
+        f"{'precision':<9} {'KiB':>9} {'private':>9} {'mapped':>9} {'ms/frame':>9} "
+        f"{'faces/s':>9} {'changed':>8} {'max |dd|':>9}"
+    )
+    context = multiprocessing.get_context("spawn")
+    try:
+        for precision in PRECISIONS:
+            with context.Pool(1) as pool:
+                nbytes, memory, seconds, decided, dists = pool.apply(
+                    measure, ((path, precision, frames, queries, args.tolerance),)
+                )
+            if reference is None:
+                reference = (decided, dists)
+            changed = int(np.sum(decided != reference[0]))
+            drift = float(np.max(np.abs(dists - reference[1])))
+            private, mapped = ("n/a", "n/a") if memory is None else memory
+            print(
+                f"{precision:<9} {nbytes / 1024:>9.0f} {private:>9} {mapped:>9} "
+                f"{seconds * 1000:>9.3f} {args.faces / seconds:>9.0f} "
+                f"{changed:>8} {drift:>9.2e}"
+            )
+    finally:
+        os.remove(path)
+        os.rmdir(directory)
+    print(
+        f"{len(queries)} queries, tolerance {args.tolerance}. KiB is what the "
+        "matcher reports; private and mapped are what each precision's process "
+        "gained in anonymous and file-backed resident memory (KiB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import detect_faces, detect_regions
+from core.roi import ROI_FULL_SCAN_EVERY, RegionPlanner
+from core.tracker import FaceTracker, box_iou
+from benchmarks.pipeline_scaling import load_frames
+
+
+def run(frames, detection_model, scale, use_regions, full_every):
+    tracker = FaceTracker()
+    planner = RegionPlanner(full_every=full_every)
+    seconds, results = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        regions = None
+        if use_regions:
+            regions = planner.plan(frame.shape, [track.box for track in tracker.tracks])
+        if regions is None:
+            boxes = detect_faces(frame, detection_model, scale)
+        else:
+            boxes = detect_regions(frame, regions, detection_model, scale)
+        seconds.append(time.perf_counter() - start)
+        tracker.update(boxes)
+        results.append(boxes)
+    return seconds, results, planner.stats()
+
+
+def recall(reference, results):
+    found, total = 0, 0
+    for ref_boxes, boxes in zip(reference, results):
+        total += len(ref_boxes)
+        found += sum(
+            1
+            for ref_box in ref_boxes
+            if any(box_iou(ref_box, box) >= 0.5 for box in boxes)
+        )
+    return found / total if total else float("nan")
+
+
+def first_seen(results, count):
+    # first frame with at least count faces, i.e. when late arrivals show up
+    return next((i for i, boxes in enumerate(results) if len(boxes) >= count), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detection cost with full-frame scans vs regions around tracks"
+    )
+    parser.add_argument(
+        "--source", required=True, help="video file or directory of frames in order"
+    )
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument("--detection-model", default="hog")
+    parser.add_argument("--full-every", type=int, default=ROI_FULL_SCAN_EVERY)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.width, args.height))
+    print(f"{len(frames)} frames at {args.width}x{args.height}")
+    print(
+        f"{'mode':<8} {'ms/frame':>9} {'searched':>9} {'speedup':>8} "
+        f"{'recall':>7} {'all seen':>9}"
+    )
+    reference = None
+    for mode in ("full", "regions"):
+        seconds, results, stats = run(
+            frames,
+            args.detection_model,
+            args.detection_scale,
+            mode == "regions",
+            args.full_every,
+        )
+        if reference is None:
+            reference, reference_seconds = results, sum(seconds)
+            most = max(len(boxes) for boxes in results)
+        seen = first_seen(results, most)
+        print(
+            f"{mode:<8} {np.mean(seconds) * 1000:>9.1f} "
+            f"{stats['mean_coverage'] if mode == 'regions' else 1.0:>9.0%} "
+            f"{reference_seconds / sum(seconds):>7.2f}x "
+            f"{recall(reference, results):>7.0%} "
+            f"{'-' if seen is None else seen:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection import detect_and_encode
+from core.gallery import GalleryMatcher
+from core.tracker import FaceTracker
+from benchmarks.pipeline_scaling import load_frames
+
+TOLERANCE = 0.6
+
+
+def enroll_first_frame(frame, detection_scale):
+    boxes, _, encodings = detect_and_encode(frame, detection_scale=detection_scale)
+    students = [
+        {"student_id": f"face{i}", "name": f"face{i}", "encoding": encoding}
+        for i, encoding in enumerate(encodings)
+    ]
+    return GalleryMatcher.from_students(students)
+
+
+def run(frames, matcher, detection_scale, use_tracker, max_encodings=None):
+    tracker = FaceTracker()
+    encode_calls = 0
+    identities = []
+    frame_seconds = []
+    for frame in frames:
+        start = time.perf_counter()
+        skip_boxes = tracker.confirmed_boxes() if use_tracker else []
+        boxes, encoded, encodings = detect_and_encode(
+            frame,
+            detection_scale=detection_scale,
+            skip_boxes=skip_boxes,
+            max_encodings=max_encodings,
+            waiting=tracker.waiting_boxes(),
+        )
+        encode_calls += len(encoded)
+        if not use_tracker:
+            # every face decided on its own, as before the tracker
+            best_idx, best_dist, _ = matcher.match(encodings)
+            identities.append(
+                [
+                    matcher.ids[idx] if dist <= TOLERANCE else None
+                    for idx, dist in zip(best_idx, best_dist)
+                ]
+            )
+            frame_seconds.append(time.perf_counter() - start)
+            continue
+
+        tracks = tracker.update(boxes)
+        pending = [
+            (tracks[i], encodings[k])
+            for k, i in enumerate(encoded)
+            if not tracks[i].confirmed
+        ]
+        if pending:
+            best_idx, best_dist, _ = matcher.match([enc for _, enc in pending])
+            for (track, _), idx, dist in zip(pending, best_idx, best_dist):
+                if dist > TOLERANCE:
+                    track.observe(None, None)
+                elif track.observe(matcher.ids[idx], matcher.names[idx]):
+                    track.identify(matcher.ids[idx], matcher.names[idx], "", None)
+        identities.append([track.student_id or track.candidate for track in tracks])
+        frame_seconds.append(time.perf_counter() - start)
+    return encode_calls, frame_seconds, identities, tracker.started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Encoding calls and frame times with the tracker and budget"
+    )
+    parser.add_argument(
+        "--source", required=True, help="video file or directory of frames in order"
+    )
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument(
+        "--max-encodings", type=int, default=2, help="per-frame encoding budget"
+    )
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.width, args.height))
+    matcher = enroll_first_frame(frames[0], args.detection_scale)
+    print(f"{len(frames)} frames, {len(matcher)} faces enrolled from the first frame")
+
+    baseline = None
+    print(
+        f"{'mode':<9} {'encodes':>8} {'ms/frame':>9} {'max ms':>7} "
+        f"{'tracks':>7} {'agree':>6} {'all named':>9}"
+    )
+    modes = (
+        ("every", False, None),
+        ("tracked", True, None),
+        ("budget", True, args.max_encodings),
+    )
+    for mode, use_tracker, max_encodings in modes:
+        calls, frame_seconds, identities, tracks = run(
+            frames, matcher, args.detection_scale, use_tracker, max_encodings
+        )
+        if baseline is None:
+            baseline = identities
+        agreed = sum(a == b for a, b in zip(baseline, identities))
+        # first frame from which every face carries its final name
+        named = next(
+            (i for i in range(len(frames)) if identities[i:] == baseline[i:]),
+            len(frames),
+        )
+        print(
+            f"{mode:<9} {calls:>8} {np.mean(frame_seconds) * 1000:>9.1f} "
+            f"{max(frame_seconds) * 1000:>7.1f} {tracks:>7} "
+            f"{agreed / len(frames):>6.0%} {named:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
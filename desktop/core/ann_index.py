@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+
+from core.gallery import ENCODING_DIM
+
+DEFAULT_N_PROBE = 8
+KMEANS_ITERATIONS = 12
+TRAIN_POINTS_PER_LIST = 64
+# retrain the coarse quantizer once the gallery has grown this much since the
+# centroids were fitted; smaller additions are just assigned to existing lists
+RETRAIN_GROWTH = 2.0
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def suggest_n_lists(n_rows):
+    return max(1, min(n_rows, int(4 * np.sqrt(n_rows))))
+
+
+def _nearest(points, centroids, centroid_sq_norms):
+    # ||p||^2 is constant per point, so it doesn't change the argmin
+    nearest = np.empty(len(points), dtype=np.intp)
+    for start in range(0, len(points), ASSIGN_CHUNK_ROWS):
+        chunk = points[start : start + ASSIGN_CHUNK_ROWS]
+        scores = centroid_sq_norms[None, :] - 2.0 * (chunk @ centroids.T)
+        nearest[start : start + len(chunk)] = np.argmin(scores, axis=1)
+    return nearest
+
+
+def _kmeans(points, n_lists, iterations, rng):
+    centroids = points[rng.choice(len(points), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+        labels = _nearest(points, centroids, sq_norms)
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty))]
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids, assignments, trained_rows, n_probe=DEFAULT_N_PROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.trained_rows = int(trained_rows)
+        self.n_probe = n_probe
+        self.set_assignments(assignments)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, matrix, n_lists=None, n_probe=DEFAULT_N_PROBE, seed=0):
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        n_lists = n_lists or suggest_n_lists(len(matrix))
+        rng = np.random.default_rng(seed)
+        n_train = min(len(matrix), n_lists * TRAIN_POINTS_PER_LIST)
+        train_points = matrix[rng.choice(len(matrix), n_train, replace=False)]
+        centroids = _kmeans(train_points, n_lists, KMEANS_ITERATIONS, rng)
+        index = cls(centroids, np.zeros(0, dtype=np.intp), len(matrix), n_probe)
+        index.set_assignments(index.assign(matrix))
+        return index
+
+    def assign(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        return _nearest(vectors, self.centroids, self.centroid_sq_norms)
+
+    def set_assignments(self, assignments):
+        self.assignments = np.asarray(assignments, dtype=np.intp)
+        counts = np.bincount(self.assignments, minlength=self.n_lists)
+        self.list_rows = np.argsort(self.assignments, kind="stable")
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def extended(self, vectors):
+        assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        return IVFIndex(self.centroids, assignments, self.trained_rows, self.n_probe)
+
+    def subset(self, rows):
+        return IVFIndex(
+            self.centroids, self.assignments[rows], self.trained_rows, self.n_probe
+        )
+
+    def candidates(self, query, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        scores = self.centroid_sq_norms - 2.0 * (self.centroids @ query)
+        if n_probe < self.n_lists:
+            probes = np.argpartition(scores, n_probe - 1)[:n_probe]
+        else:
+            probes = np.arange(self.n_lists)
+        return np.concatenate(
+            [
+                self.list_rows[self.list_offsets[p] : self.list_offsets[p + 1]]
+                for p in probes
+            ]
+        )
+
+    def save(self, path, row_keys, row_sums):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_rows=np.array(self.trained_rows),
+                row_keys=np.asarray(row_keys, dtype=str),
+                row_sums=np.asarray(row_sums, dtype=np.float32),
+            )
+        os.replace(tmp_path, path)
+
+
+def sync_index(matcher, path, n_probe=DEFAULT_N_PROBE):
+    row_keys = np.asarray(matcher.row_keys(), dtype=str)
+    row_sums = matcher.matrix.sum(axis=1)
+
+    index = None
+    if os.path.exists(path):
+        try:
+            with np.load(path) as saved:
+                index = IVFIndex(
+                    saved["centroids"],
+                    np.zeros(0, dtype=np.intp),
+                    int(saved["trained_rows"]),
+                    n_probe,
+                )
+                saved_keys = saved["row_keys"]
+                saved_assignments = saved["assignments"]
+                saved_sums = saved["row_sums"]
+        except Exception as e:
+            print(f"Ignoring unreadable gallery index {path}: {e}")
+            index = None
+
+    if index is not None and len(row_keys) > RETRAIN_GROWTH * index.trained_rows:
+        index = None
+
+    if index is None:
+        index = IVFIndex.train(matcher.matrix, n_probe=n_probe)
+        index.save(path, row_keys, row_sums)
+        return index
+
+    # reuse the stored list of every row whose key and contents are unchanged;
+    # only new or re-registered rows are assigned against the centroids
+    assignments = np.full(len(row_keys), -1, dtype=np.intp)
+    if len(saved_keys):
+        order = np.argsort(saved_keys)
+        pos = np.searchsorted(saved_keys[order], row_keys)
+        src = order[np.minimum(pos, len(order) - 1)]
+        reusable = (saved_keys[src] == row_keys) & np.isclose(
+            saved_sums[src], row_sums, atol=1e-4
+        )
+        assignments[reusable] = saved_assignments[src[reusable]]
+    stale = np.flatnonzero(assignments < 0)
+    if len(stale):
+        assignments[stale] = index.assign(matcher.matrix[stale])
+    index.set_assignments(assignments)
+    if len(stale) or len(saved_keys) != len(row_keys):
+        index.save(path, row_keys, row_sums)
+    return index
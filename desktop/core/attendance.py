@@ -1,13 +1,17 @@
+import argparse
 import cv2
-import face_recognition
 import numpy as np
 import sqlite3
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox
 import sys
+import time
 
 if getattr(sys, "frozen", False):
     BASE_DIR = os.path.dirname(sys.executable)
@@ -19,11 +23,84 @@ else:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ui.theme import *
+from core.ann_index import sync_index
+from core.gallery_cache import read_packed_gallery, write_packed_gallery
+from core.registration import migrate_students_table
+from core.capture import FrameGrabber
+from core.detection import detect_and_encode
+from core.display import WINDOW_NAME, SessionDisplay, run_displays
+from core.pipeline import RecognitionPipeline
+from core.tracker import FaceTracker
+from core.motion import MotionGate
+from core.idle import IDLE_FRAME_INTERVAL, IdleMonitor
+from core.qos import QualityController
+from core.roi import RegionPlanner
+from core.profiles import load_profile, profile_version
+from core.encoding_store import (
+    decode_encodings,
+    encoding_versions,
+    encodings_state,
+    init_encodings_table,
+    load_encoded_gallery,
+    migrate_npy_encodings,
+)
 
 DB_DIR = os.path.join(BASE_DIR, "db")
 DB_PATH = os.path.join(DB_DIR, "attendance.db")
+ENCODINGS_DIR = os.path.join(BASE_DIR, "data", "encodings")
+GALLERY_CACHE_PATH = os.path.join(BASE_DIR, "data", "gallery_cache.bin")
+# one of core.detection.DETECTORS. "haar" is the cheapest but its boxes are
+# only approximately where dlib expects them; "haar+hog" gets HOG boxes for
+# a fraction of HOG's cost, but like "haar" it only finds frontal faces
 DETECTION_MODEL = "hog"
+# the detection scale, upsampling and encoding settings come from the
+# recognition profile (see core/profiles.py). The session starts at the
+# profile's scale and adapts the scale and the detect-every-N-frames interval
+# within these bounds to hold TARGET_FPS
+TARGET_FPS = 10.0
+DETECTION_SCALE_BOUNDS = (0.25, 1.0)
+DETECTION_INTERVAL_BOUNDS = (1, 4)
+# at most this many faces are encoded per frame, largest unidentified first;
+# the rest wait for later frames so a crowd can't stall the preview
+MAX_ENCODINGS_PER_FRAME = 2
+# between periodic full scans, only search around known faces and along the
+# edges where new ones walk in (see core/roi.py)
+DETECT_IN_REGIONS = True
 TOLERANCE = 0.6
+# "samples" keeps every captured sample and matches on each student's closest
+# one; "mean" collapses them into a single averaged encoding per student
+GALLERY_MODE = "samples"
+# "float16" or "int8" scan a quantized copy of the gallery and re-rank the
+# closest candidates exactly; "float32" scans the full-precision matrix
+GALLERY_PRECISION = "float32"
+# galleries with at least this many encoding rows are searched through the
+# IVF index instead of a full linear scan
+ANN_MIN_ROWS = 20000
+ANN_INDEX_PATH = os.path.join(BASE_DIR, "data", "encodings_index.npz")
+# roster galleries kept in memory for back-to-back sessions
+ROSTER_CACHE_SIZE = 8
+ALL_STUDENTS_ROSTER = "All students"
+# how often a running session checks the database for new registrations
+RELOAD_POLL_SECONDS = 2.0
+# frames are detected and encoded by this many worker processes; 0 runs
+# recognition in the session loop itself. One core is left for capture,
+# matching and display
+RECOGNITION_WORKERS = min(4, (os.cpu_count() or 1) - 1)
+PIPELINE_WAIT_SECONDS = 0.05
+# cameras one session reads, e.g. [0, 1] for a hall with two entrances;
+# None uses the first camera that works. Every camera gets its own capture
+# thread, recognition loop and share of the workers, and all of them match
+# against one gallery and mark through one writer
+CAMERA_INDICES = None
+# no preview window at all, for kiosks that only need attendance marked;
+# a headless session runs until Ctrl+C
+HEADLESS = False
+
+_loaded_galleries = {}
+# dlib's detector and encoder models are module-level and not thread-safe:
+# cameras recognizing in-process take turns on them
+_inline_recognition_lock = threading.Lock()
+_roster_galleries = OrderedDict()
 
 Path(DB_DIR).mkdir(parents=True, exist_ok=True)
 
@@ -44,53 +121,183 @@ def init_database():
         );
     """
     )
+    migrate_students_table(cur)
+    init_encodings_table(cur)
     conn.commit()
+    migrate_npy_encodings(conn, ENCODINGS_DIR)
     conn.close()
 
 
-def load_all_students():
+def fetch_student_rows():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute(
         """
-        SELECT student_id, name, encoding_path FROM students
+        SELECT id, student_id, name, department, is_active
+        FROM students ORDER BY id
     """
     )
     rows = cur.fetchall()
+    state = encodings_state(cur)
     conn.close()
+    return rows, state
 
-    students_data = []
-    for student_id, name, encoding_path in rows:
-        candidate = None
-        if encoding_path:
-            if os.path.isabs(encoding_path) and os.path.exists(encoding_path):
-                candidate = encoding_path
-            else:
-                base = os.path.basename(encoding_path)
-                candidate = os.path.join(BASE_DIR, "data", "encodings", base)
-        if candidate and os.path.exists(candidate):
-            try:
-                encodings = np.load(candidate)
-                if encodings.ndim == 2:
-                    mean_encoding = np.mean(encodings, axis=0)
-                else:
-                    mean_encoding = encodings
-                students_data.append(
-                    {
-                        "student_id": student_id,
-                        "name": name,
-                        "encoding": mean_encoding,
-                    }
-                )
-            except Exception as e:
-                print(f"Error loading encoding for {student_id}: {e}")
-                continue
 
-    return students_data, len(rows)
+def list_rosters():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT DISTINCT department FROM students
+            WHERE is_active = 1 AND department IS NOT NULL AND department != ''
+            ORDER BY department
+        """
+        )
+        rosters = [row[0] for row in cur.fetchall()]
+    except sqlite3.OperationalError:
+        rosters = []
+    conn.close()
+    return rosters
+
+
+def gallery_fingerprint(rows, encodings_state, mode=GALLERY_MODE):
+    # department/is_active only pick rows out of the gallery, so they are
+    # left out and roster edits don't invalidate the packed cache
+    digest = hashlib.sha1(mode.encode("utf-8"))
+    digest.update(repr([row[:3] for row in rows]).encode("utf-8"))
+    digest.update(repr(encodings_state).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_gallery(fingerprint, mode=GALLERY_MODE, precision=GALLERY_PRECISION):
+    key = (fingerprint, precision)
+    if key in _loaded_galleries:
+        return _loaded_galleries[key]
+
+    try:
+        matcher = read_packed_gallery(GALLERY_CACHE_PATH, fingerprint, precision)
+    except Exception as e:
+        print(f"Ignoring unreadable gallery cache: {e}")
+        matcher = None
+    if matcher is None:
+        conn = sqlite3.connect(DB_PATH)
+        matcher = load_encoded_gallery(conn.cursor(), mode, precision)
+        conn.close()
+        try:
+            write_packed_gallery(GALLERY_CACHE_PATH, matcher, fingerprint)
+            # served from the mapped file from now on, like a cache hit, so
+            # the copy read from SQLite can be freed
+            cached = read_packed_gallery(GALLERY_CACHE_PATH, fingerprint, precision)
+            if cached is not None:
+                matcher = cached
+        except OSError as e:
+            print(f"Could not write gallery cache: {e}")
+
+    if matcher.sample_count >= ANN_MIN_ROWS:
+        matcher.attach_index(sync_index(matcher, ANN_INDEX_PATH))
+
+    _loaded_galleries.clear()
+    _loaded_galleries[key] = matcher
+    return matcher
+
+
+def load_roster_gallery(roster=None, mode=GALLERY_MODE, precision=GALLERY_PRECISION):
+    # the watcher only has to look at students registered after last_id
+    rows, state = fetch_student_rows()
+    last_id = rows[-1][0] if rows else 0
+    fingerprint = gallery_fingerprint(rows, state, mode)
+    members = tuple(
+        student_id
+        for _, student_id, _, department, is_active in rows
+        if is_active and (roster is None or department == roster)
+    )
+
+    key = (fingerprint, precision, roster, members)
+    if key in _roster_galleries:
+        _roster_galleries.move_to_end(key)
+        return _roster_galleries[key], len(members), last_id
 
+    matcher = load_gallery(fingerprint, mode, precision)
+    if len(members) != len(matcher) or len(rows) != len(matcher):
+        wanted = set(members)
+        matcher = matcher.subset(
+            [i for i, student_id in enumerate(matcher.ids) if student_id in wanted]
+        )
 
-def is_already_marked_today(student_id):
-    today = datetime.now().strftime("%Y-%m-%d")
+    _roster_galleries[key] = matcher
+    while len(_roster_galleries) > ROSTER_CACHE_SIZE:
+        _roster_galleries.popitem(last=False)
+    return matcher, len(members), last_id
+
+
+class StudentWatcher(threading.Thread):
+    def __init__(self, matcher, roster=None, last_id=0, mode=GALLERY_MODE):
+        super().__init__(daemon=True)
+        # swapped for an extended copy when students register mid-session;
+        # every camera's loop reads it from here
+        self.matcher = matcher
+        self.roster = roster
+        # the highest students.id the gallery was loaded from
+        self.last_id = last_id
+        self.mode = mode
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        conn = sqlite3.connect(DB_PATH)
+        last_id = self.last_id
+        version = None
+        # the first pass runs immediately to catch registrations committed
+        # between loading the gallery and starting this thread
+        while True:
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != version:
+                version = current
+                last_id = self._pick_up_new_students(conn, last_id)
+            if self._stop_event.wait(RELOAD_POLL_SECONDS):
+                break
+        conn.close()
+
+    def _pick_up_new_students(self, conn, last_id):
+        rows = conn.execute(
+            """
+            SELECT s.id, s.student_id, s.name, e.sample_count, e.data
+            FROM students s JOIN encodings e ON e.student_id = s.student_id
+            WHERE s.id > ? AND s.is_active = 1 AND (? IS NULL OR s.department = ?)
+                AND e.sample_count > 0
+            ORDER BY s.id
+        """,
+            (last_id, self.roster, self.roster),
+        ).fetchall()
+        if not rows:
+            return last_id
+
+        known = set(self.matcher.ids)
+        students_data = []
+        for _, student_id, name, sample_count, blob in rows:
+            if student_id in known:
+                continue
+            encodings = decode_encodings(blob, sample_count)
+            if self.mode == "mean":
+                encodings = encodings.mean(axis=0)
+            students_data.append(
+                {"student_id": student_id, "name": name, "encoding": encodings}
+            )
+        if students_data:
+            # the extended gallery is built here so the frame loops only
+            # have to pick up the new reference
+            self.matcher = self.matcher.extended(students_data)
+            for student in students_data:
+                print(f"Added to session: {student['name']} ({student['student_id']})")
+        return rows[-1][0]
+
+
+def is_already_marked_today(student_id, day=None):
+    # day is a YYYY-MM-DD date; today by default
+    today = day or datetime.now().strftime("%Y-%m-%d")
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute(
@@ -105,8 +312,8 @@ def is_already_marked_today(student_id):
     return count > 0
 
 
-def students_marked_today():
-    today = datetime.now().strftime("%Y-%m-%d")
+def students_marked_today(day=None):
+    today = day or datetime.now().strftime("%Y-%m-%d")
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute(
@@ -121,8 +328,9 @@ def students_marked_today():
     return marked_students
 
 
-def mark_attendance(student_id, student_name):
-    now = datetime.now()
+def mark_attendance(student_id, student_name, when=None):
+    # when the student was seen; recordings are marked with the frame's time
+    now = when or datetime.now()
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
     timestamp_str = now.isoformat()
@@ -153,169 +361,581 @@ def choose_camera_index():
     return -1
 
 
-def start_attendance_session():
+def count_mismatched_encodings(version):
+    conn = sqlite3.connect(DB_PATH)
+    versions = encoding_versions(conn.cursor())
+    conn.close()
+    return sum(count for other, count in versions.items() if other != version)
+
+
+def record_attendance(student_id, student_name, marked_today, when=None):
+    # marked_today holds the students already marked on when's day
+    label = f"{student_name} ({student_id})"
+    if student_id in marked_today:
+        return label + " - Already Marked", (0, 165, 255)
+    day = when.strftime("%Y-%m-%d") if when is not None else None
+    if not is_already_marked_today(student_id, day):
+        mark_attendance(student_id, student_name, when)
+        marked_today.add(student_id)
+        print(f"Attendance marked: {student_name} ({student_id})")
+        return label + " - Marked!", (0, 255, 0)
+    marked_today.add(student_id)
+    return label + " - Already Marked Today", (0, 165, 255)
+
+
+class AttendanceWriter:
+    # every camera in a session marks through this one writer, so a student
+    # seen at two entrances at once is checked and marked only once
+    def __init__(self, marked_today):
+        self.marked_today = marked_today
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.marked_today)
+
+    def record(self, student_id, student_name):
+        with self._lock:
+            return record_attendance(student_id, student_name, self.marked_today)
+
+
+def identify_tracks(tracks, encoded, encodings, matcher, writer):
+    # tracks that already have an identity keep it; only the rest are matched
+    pending = [
+        (tracks[i], encodings[k])
+        for k, i in enumerate(encoded)
+        if not tracks[i].confirmed
+    ]
+    confirmed = []
+    if not pending:
+        return confirmed
+    best_idx, best_dist, _ = matcher.match([encoding for _, encoding in pending])
+
+    for (track, _), idx, dist in zip(pending, best_idx, best_dist):
+        if dist > TOLERANCE:
+            track.observe(None, None)
+            continue
+        student_id = matcher.ids[idx]
+        student_name = matcher.names[idx]
+        if track.observe(student_id, student_name):
+            label, color = writer.record(student_id, student_name)
+            track.identify(student_id, student_name, label, color)
+            confirmed.append(track)
+    return confirmed
+
+
+def start_pipelines(count, workers, profile):
+    # one pipeline per camera, all started before waiting on any so their
+    # workers load the models at the same time; None recognizes in-process
+    if workers <= 0:
+        return [None] * count
+    pipelines = [
+        RecognitionPipeline(workers, detection_model=DETECTION_MODEL, **profile)
+        for _ in range(count)
+    ]
+    for i, pipeline in enumerate(pipelines):
+        if pipeline.wait_ready():
+            print(f"Recognition workers: {pipeline.workers}")
+        else:
+            print("Recognition workers did not start; recognizing in-process")
+            pipeline.close()
+            pipelines[i] = None
+    return pipelines
+
+
+def print_session_stats(
+    capture_stats, session_stats, session_start, pipeline_stats=None, camera=None
+):
+    processed_frames = session_stats["processed_frames"]
+    elapsed = max(time.perf_counter() - session_start, 1e-6)
+    if camera is None:
+        print("\n================= SESSION STATS =================")
+    else:
+        print(f"\n============ SESSION STATS: CAMERA {camera} ============")
+    print(f"• Duration: {elapsed:.1f}s")
+    print(
+        f"• Camera frames: {capture_stats['captured']} "
+        f"({capture_stats['captured'] / elapsed:.1f} FPS)"
+    )
+    print(
+        f"• Processed frames: {processed_frames} ({processed_frames / elapsed:.1f} FPS)"
+    )
+    print(
+        f"• Dropped stale frames: {capture_stats['dropped']} "
+        f"({capture_stats['drop_ratio']:.0%}); a high ratio means recognition "
+        "is CPU-bound"
+    )
+    detected = session_stats["faces_detected"]
+    encoded = session_stats["faces_encoded"]
+    print(
+        f"• Faces detected: {detected} across {session_stats['tracks']} tracks; "
+        f"encoded {encoded} ({1 - encoded / detected if detected else 0:.0%} "
+        "skipped as already identified)"
+    )
+    quality = session_stats["quality"]
+    print(
+        f"• Quality: ended at {quality['settings']} ({quality['fps']:.1f} FPS, "
+        f"target {TARGET_FPS:.0f}) after {quality['adjustments']} adjustments"
+    )
+    deferred_frames = session_stats["deferred_frames"]
+    print(
+        f"• Encoding budget: {MAX_ENCODINGS_PER_FRAME} per frame; deferred "
+        f"{session_stats['deferred']} encodings on {deferred_frames} frames, "
+        f"queue depth max {session_stats['max_queue']}, mean "
+        f"{session_stats['deferred'] / deferred_frames if deferred_frames else 0:.1f}"
+        " when deferring"
+    )
+    gate = session_stats["motion"]
+    checked = session_stats["recognized_frames"]
+    cost = session_stats["recognition_seconds"] / checked if checked else 0.0
+    saved = max(gate["skipped"] * cost - gate["seconds"], 0.0)
+    print(
+        f"• Motion gate: skipped detection on {gate['skipped']} of "
+        f"{gate['passed'] + gate['skipped']} frames ({gate['skip_ratio']:.0%}), "
+        f"saving ~{saved:.1f}s CPU at {cost * 1000:.0f}ms per detected frame"
+    )
+    regions = session_stats["regions"]
+    if regions["region_scans"]:
+        print(
+            f"• Region detection: {regions['region_scans']} of "
+            f"{regions['region_scans'] + regions['full_scans']} detections searched "
+            f"only around tracks and edges, {regions['mean_coverage']:.0%} of the "
+            "frame on average"
+        )
+    idle = session_stats["idle"]
+    active, idled = idle["active"], idle["idle"]
+    print(
+        f"• Idle mode: idle for {idled['seconds']:.0f}s of "
+        f"{active['seconds'] + idled['seconds']:.0f}s after {idle['idle_after']:.0f}s "
+        f"without motion or faces, woke {idle['wakeups']} times; "
+        f"{'camera' if camera is None else f'camera {camera}'} CPU (capture, "
+        f"recognition and workers) {active['cpu_ratio']:.0%} of a core active, "
+        f"{idled['cpu_ratio']:.0%} idle"
+    )
+    delays = [
+        f"{period['mean_delay']:.2f}s {label} ({period['recognitions']})"
+        for period, label in (
+            (active, "from first detection while active"),
+            (idled, "from the motion that woke the session"),
+        )
+        if period["recognitions"]
+    ]
+    if delays:
+        print(f"• Time to first recognition: {', '.join(delays)}")
+    display = session_stats["display"]
+    if display is None:
+        print("• Display: headless")
+    else:
+        print(
+            f"• Display: redrew {display['rendered']} frames "
+            f"({display['rendered'] / elapsed:.1f} FPS) outside the recognition "
+            f"loop, {display['ms_per_frame']:.1f}ms each to draw and show"
+        )
+    if pipeline_stats is not None:
+        print(f"• Recognition workers: {pipeline_stats['workers']}")
+        for pid, worker in sorted(pipeline_stats["per_worker"].items()):
+            rate = worker["frames"] / worker["seconds"] if worker["seconds"] else 0.0
+            print(
+                f"    worker {pid}: {worker['frames']} frames, "
+                f"{rate:.1f} frames/s while busy"
+            )
+    print("=================================================\n")
+
+
+class RecognitionLoop(threading.Thread):
+    # detects, tracks and identifies faces on the newest camera frame until
+    # stopped or the camera fails, handing each processed frame to the
+    # display when there is one
+    def __init__(
+        self,
+        camera,
+        grabber,
+        pipeline,
+        profile,
+        watcher,
+        writer,
+        roster_label,
+        stop_event,
+        display=None,
+    ):
+        super().__init__(name=f"recognition-{camera}", daemon=True)
+        self.camera = camera
+        self.grabber = grabber
+        self.pipeline = pipeline
+        self.profile = profile
+        self.watcher = watcher
+        self.writer = writer
+        self.roster_label = roster_label
+        self.stop_event = stop_event
+        self.display = display
+        # boxes are followed across frames so identified faces aren't re-encoded
+        self.tracker = FaceTracker()
+        # static scenes (nobody at the kiosk) skip detection entirely
+        self.motion_gate = MotionGate()
+        self.region_planner = RegionPlanner()
+        # an empty kiosk drops to a few frames a second until something moves.
+        # Created on this loop's own thread, whose CPU it measures
+        self.idle = None
+        self.idle_stats = None
+        self.quality = QualityController(
+            TARGET_FPS,
+            profile["detection_scale"],
+            DETECTION_SCALE_BOUNDS,
+            DETECTION_INTERVAL_BOUNDS,
+        )
+        self.session_stats = {
+            "processed_frames": 0,
+            "faces_detected": 0,
+            "faces_encoded": 0,
+            "deferred": 0,
+            "deferred_frames": 0,
+            "max_queue": 0,
+            "recognized_frames": 0,
+            "recognition_seconds": 0.0,
+            "recognized": 0,
+        }
+        self.error = None
+
+    def run(self):
+        # re-raised by the session once the camera and workers are released
+        try:
+            self.idle = IdleMonitor(cpu_clock=self._cpu_seconds)
+            self._loop()
+            self.idle_stats = self.idle.stats()
+        except Exception as e:
+            print(f"Recognition stopped on camera {self.camera}: {e}")
+            self.error = e
+
+    def _cpu_seconds(self):
+        # this camera's share: its recognition loop and capture threads, and
+        # its recognition workers. Other cameras and the display aren't counted
+        seconds = time.thread_time() + self.grabber.cpu_seconds
+        if self.pipeline is not None:
+            seconds += self.pipeline.cpu_seconds
+        return seconds
+
+    def _loop(self):
+        grabber, pipeline, profile = self.grabber, self.pipeline, self.profile
+        tracker, motion_gate, region_planner = (
+            self.tracker,
+            self.motion_gate,
+            self.region_planner,
+        )
+        idle, quality, session_stats = self.idle, self.quality, self.session_stats
+        last_read = None
+        last_gated = False
+        # reused every frame: the RGB copy detection reads in-process.
+        # Detection sees the camera frame unflipped; only the display mirrors
+        frame_rgb = None
+
+        while not self.stop_event.is_set():
+            ready = []
+            if pipeline is not None:
+                # collect whatever the workers finished, and only block when every
+                # slot is busy so the frame grabbed next is still the newest one
+                ready = pipeline.results(
+                    timeout=0.0 if pipeline.has_free_slot() else PIPELINE_WAIT_SECONDS
+                )
+
+            if pipeline is None or pipeline.has_free_slot():
+                ok, frame_bgr, _ = grabber.read()
+                if not ok or frame_bgr is None:
+                    print(f"Failed to read from camera {self.camera}")
+                    break
+                # time between reads is what one frame cost; frames the motion
+                # gate skipped say nothing about load, and idle frames are slow on
+                # purpose, so neither counts
+                now = time.perf_counter()
+                if last_read is not None and not last_gated and not idle.idle:
+                    quality.record(now - last_read)
+                last_read = now
+
+                last_gated = False
+                # idle frames are rare enough to check each one for motion
+                if not idle.idle and not quality.detection_due():
+                    if pipeline is None or not pipeline.pending():
+                        ready.append((frame_bgr, None, [], []))
+                # faces still waiting for a confirmed identity are always detected
+                elif not motion_gate.check(frame_bgr, force=tracker.has_unconfirmed()):
+                    last_gated = True
+                    # pipelined frames still in flight are older; don't jump ahead
+                    if pipeline is None or not pipeline.pending():
+                        ready.append((frame_bgr, None, [], []))
+                else:
+                    if motion_gate.moved and idle.activity():
+                        # whoever woke the session may be anywhere in the frame
+                        grabber.set_interval(0.0)
+                        region_planner.reset()
+                    regions = None
+                    if DETECT_IN_REGIONS:
+                        regions = region_planner.plan(
+                            frame_bgr.shape, [track.box for track in tracker.tracks]
+                        )
+                    frame_options = {
+                        "detection_scale": quality.scale,
+                        "skip_boxes": tracker.confirmed_boxes(),
+                        "max_encodings": MAX_ENCODINGS_PER_FRAME,
+                        "waiting": tracker.waiting_boxes(),
+                        "regions": regions,
+                    }
+                    if pipeline is None:
+                        frame_rgb = cv2.cvtColor(
+                            frame_bgr, cv2.COLOR_BGR2RGB, dst=frame_rgb
+                        )
+                        start = time.perf_counter()
+                        with _inline_recognition_lock:
+                            boxes, encoded, encodings = detect_and_encode(
+                                frame_rgb,
+                                DETECTION_MODEL,
+                                **{**profile, **frame_options},
+                            )
+                        session_stats["recognition_seconds"] += (
+                            time.perf_counter() - start
+                        )
+                        session_stats["recognized_frames"] += 1
+                        ready.append((frame_bgr, boxes, encoded, encodings))
+                    else:
+                        pipeline.submit(
+                            frame_bgr,
+                            frame_bgr,
+                            color_conversion=cv2.COLOR_BGR2RGB,
+                            **frame_options,
+                        )
+
+            matcher = self.watcher.matcher
+            for frame_bgr, boxes, encoded, encodings in ready:
+                session_stats["processed_frames"] += 1
+                if boxes is None:
+                    # nothing moved: keep showing the faces from the last detection
+                    tracks = tracker.visible()
+                else:
+                    session_stats["faces_detected"] += len(boxes)
+                    session_stats["faces_encoded"] += len(encoded)
+                    tracks = tracker.update(boxes)
+                    # unidentified faces the budget left for a later frame
+                    queued = sum(
+                        1
+                        for i, track in enumerate(tracks)
+                        if not track.confirmed and i not in encoded
+                    )
+                    if queued:
+                        session_stats["deferred"] += queued
+                        session_stats["deferred_frames"] += 1
+                        session_stats["max_queue"] = max(
+                            session_stats["max_queue"], queued
+                        )
+                    for track in identify_tracks(
+                        tracks, encoded, encodings, matcher, self.writer
+                    ):
+                        idle.recognized(track)
+                        session_stats["recognized"] += 1
+                if tracks and idle.activity():
+                    grabber.set_interval(0.0)
+                if self.display is not None:
+                    self.display.publish(
+                        frame_bgr,
+                        tracks,
+                        {
+                            "roster_label": self.roster_label,
+                            "students": len(matcher),
+                            "marked": len(self.writer),
+                            "dropped": grabber.dropped,
+                            "quality": f"{quality.describe()} at {quality.fps:.1f} FPS",
+                        },
+                    )
+
+            if idle.update():
+                grabber.set_interval(IDLE_FRAME_INTERVAL)
+                tracker.clear()
+
+
+def print_camera_comparison(loops, session_start):
+    # side by side, so the entrance that holds the session back stands out
+    elapsed = max(time.perf_counter() - session_start, 1e-6)
+    print("================= CAMERAS =================")
+    print(
+        f"{'camera':>6} {'camera FPS':>10} {'processed':>9} {'dropped':>7} "
+        f"{'faces':>6} {'recognized':>10}  quality"
+    )
+    for loop in loops:
+        capture = loop.grabber.stats()
+        stats = loop.session_stats
+        print(
+            f"{loop.camera:>6} {capture['captured'] / elapsed:>10.1f} "
+            f"{stats['processed_frames'] / elapsed:>9.1f} "
+            f"{capture['drop_ratio']:>7.0%} {stats['faces_detected']:>6} "
+            f"{stats['recognized']:>10}  {stats['quality']['settings']}"
+        )
+    print("===========================================\n")
+
+
+def start_attendance_session(roster=None, headless=HEADLESS, cameras=None):
     init_database()
-    students_data, total_rows = load_all_students()
+    matcher, total_rows, last_id = load_roster_gallery(roster)
 
+    if total_rows == 0 and roster is not None:
+        return False, f"No active students found in roster '{roster}'."
     if total_rows == 0:
         return False, "No registered students found. Please register students first."
-    if len(students_data) == 0:
+    if len(matcher) == 0:
         return (
             False,
             "Registered students found but encodings are missing. Please re-capture faces.",
         )
 
-    cam_idx = choose_camera_index()
-    if cam_idx < 0:
-        return (
-            False,
-            "No working camera found. Check permissions or close apps using the camera.",
+    cameras = cameras or CAMERA_INDICES
+    if not cameras:
+        cam_idx = choose_camera_index()
+        if cam_idx < 0:
+            return (
+                False,
+                "No working camera found. Check permissions or close apps using the camera.",
+            )
+        cameras = [cam_idx]
+
+    roster_label = roster or ALL_STUDENTS_ROSTER
+    print(
+        f"Gallery ({GALLERY_MODE}, {GALLERY_PRECISION}) for {roster_label}: "
+        f"{len(matcher)} students, {matcher.sample_count} encodings, "
+        f"{matcher.nbytes / 1024:.0f} KiB"
+    )
+    if matcher.index is not None:
+        print(
+            f"Using IVF index: {matcher.index.n_lists} lists, "
+            f"probing {matcher.index.n_probe}"
         )
 
-    known_encodings = [student["encoding"] for student in students_data]
-    known_ids = [student["student_id"] for student in students_data]
-    known_names = [student["name"] for student in students_data]
+    profile_name, profile = load_profile()
+    print(f"Recognition profile: {profile_name} ({profile_version(profile)})")
+    mismatched = count_mismatched_encodings(profile_version(profile))
+    if mismatched:
+        print(
+            f"{mismatched} students were encoded with other settings than the "
+            f"{profile_name} profile and may not be recognized; run "
+            "maintenance.py reembed"
+        )
 
-    cap = cv2.VideoCapture(cam_idx, cv2.CAP_AVFOUNDATION)
-    if not cap.isOpened():
+    captures = []
+    for index in cameras:
+        cap = cv2.VideoCapture(index, cv2.CAP_AVFOUNDATION)
+        if cap.isOpened():
+            captures.append((index, cap))
+        else:
+            print(f"Could not open camera {index}")
+    if not captures:
         return False, "Could not open camera"
 
     marked_students = students_marked_today()
     marked_today = set(marked_students)
+    writer = AttendanceWriter(marked_today)
+
+    watcher = StudentWatcher(matcher, roster, last_id)
+    watcher.start()
+
+    # the workers only detect and encode, so splitting them between cameras
+    # still leaves one gallery, in this process
+    pipelines = start_pipelines(
+        len(captures),
+        max(RECOGNITION_WORKERS // len(captures), 1) if RECOGNITION_WORKERS else 0,
+        profile,
+    )
+    stop_event = threading.Event()
+    loops = []
+    for (index, cap), pipeline in zip(captures, pipelines):
+        # a separate thread keeps grabbing so the loop always gets the newest
+        # frame instead of whatever queued up in the driver while it was busy
+        grabber = FrameGrabber(cap)
+        grabber.start()
+        # drawing and showing the preview happen on the main thread at the
+        # display's own rate, so they don't take time from recognition
+        display = None
+        if not headless:
+            window = WINDOW_NAME
+            if len(captures) > 1:
+                window = f"{WINDOW_NAME} - camera {index}"
+            display = SessionDisplay(window)
+        loops.append(
+            RecognitionLoop(
+                index,
+                grabber,
+                pipeline,
+                profile,
+                watcher,
+                writer,
+                roster_label,
+                stop_event,
+                display,
+            )
+        )
 
     print("\n================= ATTENDANCE SESSION =================")
     print("• Look at the camera")
     print("• Attendance will be marked automatically when face is recognized")
-    print("• Press ESC to stop the session")
+    if len(loops) > 1:
+        print(f"• Cameras: {', '.join(str(loop.camera) for loop in loops)}")
+    if headless:
+        print("• Running headless; press Ctrl+C to stop the session")
+    else:
+        print("• Press ESC to stop the session")
     print("=====================================================\n")
 
-    while True:
-        ok, frame_bgr = cap.read()
-        if not ok or frame_bgr is None:
-            print("Failed to read from camera")
-            break
-
-        frame_bgr = cv2.flip(frame_bgr, 1)
-        h, w = frame_bgr.shape[:2]
-
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        boxes = face_recognition.face_locations(frame_rgb, model=DETECTION_MODEL)
-
-        recognized = False
-        recognized_student = None
-
-        if len(boxes) > 0:
-            encodings = face_recognition.face_encodings(frame_rgb, boxes)
-
-            for encoding, (top, right, bottom, left) in zip(encodings, boxes):
-                matches = face_recognition.compare_faces(
-                    known_encodings, encoding, tolerance=TOLERANCE
-                )
-                face_distances = face_recognition.face_distance(
-                    known_encodings, encoding
-                )
-
-                if True in matches:
-                    best_match_idx = np.argmin(face_distances)
-                    if matches[best_match_idx]:
-                        recognized = True
-                        student_id = known_ids[best_match_idx]
-                        student_name = known_names[best_match_idx]
-                        recognized_student = {
-                            "student_id": student_id,
-                            "name": student_name,
-                        }
-
-                        color = (0, 255, 0)
-                        label = f"{student_name} ({student_id})"
-
-                        if student_id in marked_today:
-                            label += " - Already Marked"
-                            color = (0, 165, 255)
-                        else:
-                            if not is_already_marked_today(student_id):
-                                mark_attendance(student_id, student_name)
-                                marked_today.add(student_id)
-                                print(
-                                    f"Attendance marked: {student_name} ({student_id})"
-                                )
-                                label += " - Marked!"
-                            else:
-                                marked_today.add(student_id)
-                                label += " - Already Marked Today"
-                                color = (0, 165, 255)
-                    else:
-                        color = (0, 0, 255)
-                        label = "Unknown"
-                else:
-                    color = (0, 0, 255)
-                    label = "Unrecognized"
-
-                cv2.rectangle(frame_bgr, (left, top), (right, bottom), color, 2)
-                cv2.rectangle(
-                    frame_bgr,
-                    (left, bottom - 35),
-                    (right, bottom),
-                    color,
-                    cv2.FILLED,
-                )
-                cv2.putText(
-                    frame_bgr,
-                    label,
-                    (left + 6, bottom - 6),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (255, 255, 255),
-                    2,
-                )
-
-        cv2.putText(
-            frame_bgr,
-            f"Students registered: {len(students_data)}",
-            (10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
-        cv2.putText(
-            frame_bgr,
-            f"Marked today: {len(marked_today)}",
-            (10, 60),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
+    session_start = time.perf_counter()
+    for loop in loops:
+        loop.start()
+    if not headless:
+        run_displays([loop.display for loop in loops], loops, stop_event)
+    else:
+        try:
+            while any(loop.is_alive() for loop in loops):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            stop_event.set()
+    for loop in loops:
+        loop.join()
+
+    watcher.stop()
+    for loop in loops:
+        loop.grabber.stop()
+    for _, cap in captures:
+        cap.release()
+    camera_stats = []
+    for loop in loops:
+        session_stats = loop.session_stats
+        pipeline_stats = None
+        if loop.pipeline is not None:
+            pipeline_stats = loop.pipeline.stats()
+            loop.pipeline.close()
+            for worker in pipeline_stats["per_worker"].values():
+                session_stats["recognized_frames"] += worker["frames"]
+                session_stats["recognition_seconds"] += worker["seconds"]
+        camera_stats.append((loop, pipeline_stats))
+    for loop in loops:
+        if loop.error is not None:
+            raise loop.error
+
+    for loop, pipeline_stats in camera_stats:
+        session_stats = loop.session_stats
+        quality = loop.quality
+        session_stats["tracks"] = loop.tracker.started
+        session_stats["motion"] = loop.motion_gate.stats()
+        session_stats["regions"] = loop.region_planner.stats()
+        session_stats["idle"] = loop.idle_stats
+        session_stats["quality"] = {
+            "settings": quality.describe(),
+            "fps": quality.fps,
+            "adjustments": quality.adjustments,
+        }
+        session_stats["display"] = (
+            None if loop.display is None else loop.display.stats()
         )
-        cv2.putText(
-            frame_bgr,
-            "Press ESC to stop",
-            (10, h - 20),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            2,
+        print_session_stats(
+            loop.grabber.stats(),
+            session_stats,
+            session_start,
+            pipeline_stats,
+            loop.camera if len(loops) > 1 else None,
         )
-
-        if len(boxes) == 0:
-            cv2.putText(
-                frame_bgr,
-                "No face detected",
-                (10, 90),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 0, 255),
-                2,
-            )
-
-        cv2.imshow("Attendance Session", frame_bgr)
-        key = cv2.waitKey(1) & 0xFF
-
-        if key == 27:
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    if len(loops) > 1:
+        print_camera_comparison(loops, session_start)
 
     return True, f"Session ended. {len(marked_today)} students marked today."
 
@@ -326,7 +946,7 @@ def create_gui(parent=None):
     else:
         root = tk.Tk()
     root.title("Mark Attendance")
-    root.geometry("600x500")
+    root.geometry("600x580")
     root.config(bg=BG_PRIMARY)
     root.resizable(False, False)
 
@@ -371,6 +991,36 @@ def create_gui(parent=None):
     )
     status_label.pack(pady=(0, 20))
 
+    init_database()
+    roster_var = tk.StringVar(value=ALL_STUDENTS_ROSTER)
+
+    roster_label = tk.Label(
+        inner_content,
+        text="Roster",
+        font=FONT_LABEL,
+        bg=BG_SECONDARY,
+        fg=TEXT_SECONDARY,
+        anchor="w",
+    )
+    roster_label.pack(fill="x", pady=(0, 8))
+
+    roster_menu = tk.OptionMenu(
+        inner_content, roster_var, ALL_STUDENTS_ROSTER, *list_rosters()
+    )
+    roster_menu.config(
+        font=FONT_INPUT,
+        bg=BG_PRIMARY,
+        fg=TEXT_PRIMARY,
+        activebackground=BORDER_COLOR,
+        activeforeground=TEXT_PRIMARY,
+        relief="flat",
+        bd=0,
+        highlightthickness=1,
+        highlightbackground=BORDER_COLOR,
+    )
+    roster_menu["menu"].config(font=FONT_INPUT, bg=BG_PRIMARY, fg=TEXT_PRIMARY)
+    roster_menu.pack(fill="x", ipady=6)
+
     is_running = [False]
 
     def on_start_session():
@@ -384,7 +1034,10 @@ def create_gui(parent=None):
         root.update()
 
         try:
-            success, message = start_attendance_session()
+            roster = roster_var.get()
+            if roster == ALL_STUDENTS_ROSTER:
+                roster = None
+            success, message = start_attendance_session(roster)
 
             if success:
                 status_label.config(text=message, fg=SUCCESS_COLOR)
@@ -460,4 +1113,26 @@ def create_gui(parent=None):
 
 
 if __name__ == "__main__":
-    create_gui()
+    parser = argparse.ArgumentParser(description="Take attendance from the camera")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run a session straight away, without the GUI or a preview window",
+    )
+    parser.add_argument(
+        "--cameras",
+        type=lambda value: [int(index) for index in value.split(",")],
+        help="comma-separated camera indices, e.g. 0,1, for this and GUI "
+        "sessions; the first working camera by default",
+    )
+    parser.add_argument(
+        "--roster", help="roster to take attendance for; all students by default"
+    )
+    args = parser.parse_args()
+    if args.cameras:
+        CAMERA_INDICES = args.cameras
+    if args.headless:
+        _, message = start_attendance_session(args.roster, headless=True)
+        print(message)
+    else:
+        create_gui()
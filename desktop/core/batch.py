@@ -0,0 +1,308 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(sys.executable)
+    sys.path.insert(0, os.path.join(BASE_DIR, "desktop"))
+else:
+    BASE_DIR = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.gallery import ENCODING_DIM
+from core.pipeline import START_METHOD
+from core.profiles import load_profile, profile_version
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+# one frame is recognized per this many seconds of video; anyone attending
+# is in view for far longer
+BATCH_SAMPLE_SECONDS = 1.0
+# workers take videos this many seconds at a time, each seeking straight to
+# its chunk, so decoding is spread over the pool as well
+BATCH_CHUNK_SECONDS = 120.0
+BATCH_CHUNK_IMAGES = 16
+# like a live track, a student in a video is only marked after matching on
+# this many sampled frames, at most BATCH_CONFIRM_SECONDS apart. Photos are
+# separate shots, so one match in a photo is enough
+BATCH_CONFIRM_MATCHES = 2
+BATCH_CONFIRM_SECONDS = 10.0
+# a recording has no camera to leave a core for
+BATCH_WORKERS = os.cpu_count() or 1
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def video_duration(path):
+    # None when the file can't be read; 0 when it doesn't say how long it is
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    return frames / fps if fps > 0 and frames > 0 else 0.0
+
+
+def plan_chunks(path, sample_every):
+    if os.path.isdir(path):
+        images = list_images(path)
+        return [
+            ("images", images[i : i + BATCH_CHUNK_IMAGES])
+            for i in range(0, len(images), BATCH_CHUNK_IMAGES)
+        ]
+    duration = video_duration(path)
+    if duration is None:
+        return None
+    if not duration:
+        return [("video", path, 0.0, float("inf"), sample_every)]
+    return [
+        ("video", path, start, min(start + BATCH_CHUNK_SECONDS, duration), sample_every)
+        for start in np.arange(0.0, duration, BATCH_CHUNK_SECONDS)
+    ]
+
+
+def _recognize_chunk(task):
+    # runs in the pool; the first chunk a worker gets loads the dlib models
+    from core.detection import detect_and_encode
+
+    chunk, options = task
+    frames = []
+    decoded = 0
+    # how far into the video decoding got; the length of one that doesn't
+    # say how long it is
+    offset = 0.0
+    frame_rgb = None
+    start = time.perf_counter()
+
+    def recognize(frame_bgr):
+        nonlocal frame_rgb
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        boxes, _, encodings = detect_and_encode(frame_rgb, **options)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        return len(boxes), encodings
+
+    if chunk[0] == "video":
+        _, path, begin, end, sample_every = chunk
+        cap = cv2.VideoCapture(path)
+        if begin:
+            cap.set(cv2.CAP_PROP_POS_MSEC, begin * 1000.0)
+        next_sample = begin
+        frame_bgr = None
+        # grab() skips a frame without converting it; only sampled frames are
+        # retrieved into a buffer
+        while cap.grab():
+            decoded += 1
+            offset = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if offset >= end:
+                break
+            if offset < next_sample:
+                continue
+            ok, frame_bgr = cap.retrieve(frame_bgr)
+            if not ok:
+                break
+            frames.append((offset, *recognize(frame_bgr)))
+            while next_sample <= offset:
+                next_sample += sample_every
+        cap.release()
+    else:
+        for path in chunk[1]:
+            image = cv2.imread(path)
+            if image is None:
+                print(f"Skipping unreadable image {path}")
+                continue
+            decoded += 1
+            frames.append((path, *recognize(image)))
+    return frames, decoded, time.perf_counter() - start, offset
+
+
+def run_batch(
+    sources,
+    roster=None,
+    sample_every=BATCH_SAMPLE_SECONDS,
+    workers=BATCH_WORKERS,
+    start=None,
+):
+    # imported here: pool workers re-import this module and need neither the
+    # GUI nor the gallery
+    from core.attendance import (
+        ALL_STUDENTS_ROSTER,
+        DETECTION_MODEL,
+        TOLERANCE,
+        count_mismatched_encodings,
+        init_database,
+        load_roster_gallery,
+        record_attendance,
+        students_marked_today,
+    )
+
+    init_database()
+    matcher, total_rows, _ = load_roster_gallery(roster)
+    if len(matcher) == 0:
+        print("No students with encodings to take attendance for.")
+        return False
+
+    profile_name, profile = load_profile()
+    mismatched = count_mismatched_encodings(profile_version(profile))
+    if mismatched:
+        print(
+            f"{mismatched} students were encoded with other settings than the "
+            f"{profile_name} profile and may not be recognized; run "
+            "maintenance.py reembed"
+        )
+
+    tasks = []
+    videos = 0
+    video_seconds = 0.0
+    for source in sources:
+        chunks = plan_chunks(source, sample_every)
+        if chunks is None:
+            print(f"Skipping {source}: not an image directory or a readable video")
+            continue
+        if chunks and chunks[0][0] == "video":
+            videos += 1
+            duration = chunks[-1][3]
+            if start is not None:
+                base = start
+            elif duration == float("inf"):
+                # worked out from the decoded length once the video is done
+                base = None
+            else:
+                video_seconds += duration
+                # a recording ends when its file is last written
+                base = datetime.fromtimestamp(os.path.getmtime(source)) - timedelta(
+                    seconds=duration
+                )
+            tasks.extend((source, base, chunk) for chunk in chunks)
+        else:
+            tasks.extend((source, None, chunk) for chunk in chunks)
+    if not tasks:
+        print("Nothing to process.")
+        return False
+    if start is not None and videos > 1:
+        print("--start gives one video's start time; pass a single video with it")
+        return False
+
+    print(
+        f"Batch attendance for {roster or ALL_STUDENTS_ROSTER}: {len(matcher)} "
+        f"students, profile {profile_name}; {len(sources)} sources in "
+        f"{len(tasks)} chunks, sampled every {sample_every:g}s, {workers} workers"
+    )
+
+    options = {"detection_model": DETECTION_MODEL, **profile}
+    # students already marked, per day
+    marked = {}
+    # per video, each student's run of matches: (first seen, last seen, count)
+    sightings = {}
+    stats = {"frames": 0, "decoded": 0, "faces": 0, "busy": 0.0, "marked": 0}
+    previous_source = None
+    batch_start = time.perf_counter()
+    context = multiprocessing.get_context(START_METHOD)
+    with context.Pool(workers) as pool:
+        # imap hands results back in order, so marks carry each student's
+        # earliest sighting even though chunks finish out of order
+        results = pool.imap(
+            _recognize_chunk, [(chunk, options) for _, _, chunk in tasks]
+        )
+        for (source, base, chunk), (frames, decoded, busy, end) in zip(tasks, results):
+            if source != previous_source:
+                sightings = {}
+                previous_source = source
+            stats["decoded"] += decoded
+            stats["busy"] += busy
+            if chunk[0] == "video" and base is None:
+                # a video of unknown length is a single chunk, so it is decoded
+                # to its end by now
+                video_seconds += end
+                base = datetime.fromtimestamp(os.path.getmtime(source)) - timedelta(
+                    seconds=end
+                )
+            for position, faces, encodings in frames:
+                stats["frames"] += 1
+                stats["faces"] += faces
+                if not len(encodings):
+                    continue
+                if chunk[0] == "images":
+                    when = datetime.fromtimestamp(os.path.getmtime(position))
+                    needed = 1
+                else:
+                    when = base + timedelta(seconds=position)
+                    needed = BATCH_CONFIRM_MATCHES
+                day = when.strftime("%Y-%m-%d")
+                if day not in marked:
+                    marked[day] = set(students_marked_today(day))
+                best_idx, best_dist, _ = matcher.match(list(encodings))
+                for idx, dist in zip(best_idx, best_dist):
+                    student_id = matcher.ids[idx]
+                    if dist > TOLERANCE or student_id in marked[day]:
+                        continue
+                    first, last, count = sightings.get(student_id, (when, when, 0))
+                    if (when - last).total_seconds() > BATCH_CONFIRM_SECONDS:
+                        first, count = when, 0
+                    sightings[student_id] = (first, when, count + 1)
+                    if count + 1 >= needed:
+                        record_attendance(
+                            student_id, matcher.names[idx], marked[day], first
+                        )
+                        stats["marked"] += 1
+    elapsed = max(time.perf_counter() - batch_start, 1e-6)
+
+    print("\n================= BATCH STATS =================")
+    print(f"• Duration: {elapsed:.1f}s")
+    print(
+        f"• Frames: recognized {stats['frames']} of {stats['decoded']} decoded "
+        f"({stats['frames'] / elapsed:.1f} frames/s)"
+    )
+    print(f"• Faces: {stats['faces']} ({stats['faces'] / elapsed:.1f} faces/s)")
+    if video_seconds:
+        print(
+            f"• Video: {video_seconds / 60:.1f} min in {elapsed / 60:.1f} min, "
+            f"{elapsed / video_seconds:.1%} of real time"
+        )
+    print(f"• Workers: {workers}, busy {stats['busy'] / (workers * elapsed):.0%}")
+    print(f"• Marked: {stats['marked']} students")
+    print("===============================================\n")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Take attendance from recorded videos and photo directories"
+    )
+    parser.add_argument("sources", nargs="+", help="video files or image directories")
+    parser.add_argument("--roster", help="roster to mark; all students by default")
+    parser.add_argument(
+        "--sample-every",
+        type=float,
+        default=BATCH_SAMPLE_SECONDS,
+        help="seconds of video between recognized frames",
+    )
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        help="when the video started recording, e.g. 2026-10-18T09:00; only "
+        "with a single video. By default each video ends at its file's "
+        "modification time. Photos are always marked at their own "
+        "modification time",
+    )
+    args = parser.parse_args()
+    run_batch(args.sources, args.roster, args.sample_every, args.workers, args.start)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,88 @@
+import collections
+import threading
+import time
+
+CAPTURE_BUFFER_SIZE = 2
+
+
+class FrameGrabber(threading.Thread):
+    def __init__(self, cap, buffer_size=CAPTURE_BUFFER_SIZE):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self._frames = collections.deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        # seconds between decoded frames; 0 decodes every frame
+        self.interval = 0.0
+        self._last_decoded = 0.0
+        # CPU this thread has used, read by the camera's recognition loop
+        self.cpu_seconds = 0.0
+        self.failed = False
+        self.captured = 0
+        self.skipped = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.cpu_seconds = time.thread_time()
+            if self.interval and time.monotonic() - self._last_decoded < self.interval:
+                # keeps the driver's queue drained, so the next decoded frame
+                # is current, without paying for decoding this one
+                if not self.cap.grab():
+                    with self._cond:
+                        self.failed = True
+                        self._cond.notify_all()
+                    return
+                self.skipped += 1
+                continue
+            ok, frame = self.cap.read()
+            self._last_decoded = time.monotonic()
+            with self._cond:
+                if not ok or frame is None:
+                    self.failed = True
+                    self._cond.notify_all()
+                    return
+                self.captured += 1
+                if len(self._frames) == self._frames.maxlen:
+                    # deque(maxlen) evicts the oldest frame on append
+                    self.dropped += 1
+                self._frames.append((time.monotonic(), frame))
+                self._cond.notify_all()
+
+    def read(self, timeout=2.0):
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._frames or self.failed or self._stop_event.is_set(),
+                timeout,
+            )
+            if not self._frames:
+                return False, None, None
+            captured_at, frame = self._frames.pop()
+            # anything older than the newest frame is stale by now
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            self.delivered += 1
+            return True, frame, captured_at
+
+    def set_interval(self, seconds):
+        # read() waits up to its timeout for a frame, so keep this below it
+        self.interval = seconds
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+    def stats(self):
+        with self._cond:
+            drop_ratio = self.dropped / self.captured if self.captured else 0.0
+            return {
+                "captured": self.captured,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "drop_ratio": drop_ratio,
+                "skipped": self.skipped,
+            }
@@ -0,0 +1,248 @@
+import os
+
+import cv2
+import face_recognition
+
+from core.encoding_store import ENCODING_LANDMARK_MODEL, ENCODING_NUM_JITTERS
+from core.tracker import TRACK_IOU_THRESHOLD, box_iou
+
+# "hog" and "cnn" are dlib's detectors, "haar" is OpenCV's Haar cascade, and
+# "haar+hog" lets the cascade propose regions that HOG then confirms
+DETECTION_MODEL = "hog"
+# faces are looked for on a copy resized by this factor; boxes are mapped back
+# and encoded on the full-resolution frame, so only detection gets cheaper
+DETECTION_SCALE = 1.0
+# times dlib upsamples the image before detecting; each one halves the
+# smallest face found (~80px at 0) and roughly quadruples the cost
+DETECTION_UPSAMPLE = 1
+HAAR_CASCADE_FILE = "haarcascade_frontalface_default.xml"
+HAAR_SCALE_FACTOR = 1.2
+HAAR_MIN_NEIGHBORS = 5
+# the smallest face HOG finds at DETECTION_UPSAMPLE, so both backends see the
+# same faces at a given detection scale and upsampling
+HAAR_MIN_FACE = 40
+# Haar boxes reach further up the forehead than dlib's; moved and shrunk by
+# these fractions of their width (top, left, size) they line up with the HOG
+# box, which is what the landmark model and the tracker expect
+HAAR_TO_HOG_BOX = (0.13, 0.05, 0.88)
+# in "haar+hog" the cascade keeps weaker candidates and leaves the rejecting
+# to HOG, which runs on each candidate padded by this fraction and resized so
+# the candidate is CASCADE_FACE_SIZE pixels wide
+CASCADE_MIN_NEIGHBORS = 3
+CASCADE_PADDING = 0.3
+CASCADE_FACE_SIZE = 100
+
+_haar_cascade = None
+
+
+def scale_boxes(boxes, scale, frame_shape, offset=(0, 0)):
+    # maps boxes found on an image resized by scale, whose top-left corner sat
+    # at offset (y, x) in the frame, back to frame coordinates
+    h, w = frame_shape[:2]
+    y, x = offset
+    scaled = []
+    for top, right, bottom, left in boxes:
+        scaled.append(
+            (
+                max(int(round(top / scale)) + y, 0),
+                min(int(round(right / scale)) + x, w - 1),
+                min(int(round(bottom / scale)) + y, h - 1),
+                max(int(round(left / scale)) + x, 0),
+            )
+        )
+    return scaled
+
+
+def mirror_box(box, width):
+    # the same box in a horizontally flipped copy of the frame
+    top, right, bottom, left = box
+    return top, width - 1 - left, bottom, width - 1 - right
+
+
+def _haar_detector():
+    # loaded on first use, once per process
+    global _haar_cascade
+    if _haar_cascade is None:
+        path = os.path.join(cv2.data.haarcascades, HAAR_CASCADE_FILE)
+        cascade = cv2.CascadeClassifier(path)
+        if cascade.empty():
+            raise RuntimeError(f"Could not load Haar cascade {path}")
+        _haar_cascade = cascade
+    return _haar_cascade
+
+
+def _haar_boxes(image_rgb, min_neighbors, upsample):
+    gray = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2GRAY)
+    side = int(HAAR_MIN_FACE * 2 ** (DETECTION_UPSAMPLE - upsample))
+    found = _haar_detector().detectMultiScale(
+        gray,
+        scaleFactor=HAAR_SCALE_FACTOR,
+        minNeighbors=min_neighbors,
+        minSize=(side, side),
+    )
+    return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in found]
+
+
+def detect_hog(image_rgb, upsample=DETECTION_UPSAMPLE):
+    return face_recognition.face_locations(image_rgb, upsample, model="hog")
+
+
+def detect_cnn(image_rgb, upsample=DETECTION_UPSAMPLE):
+    return face_recognition.face_locations(image_rgb, upsample, model="cnn")
+
+
+def detect_haar(image_rgb, upsample=DETECTION_UPSAMPLE):
+    h, w = image_rgb.shape[:2]
+    shift_top, shift_left, size = HAAR_TO_HOG_BOX
+    boxes = []
+    for top, right, bottom, left in _haar_boxes(
+        image_rgb, HAAR_MIN_NEIGHBORS, upsample
+    ):
+        width = right - left
+        top = top + int(round(shift_top * width))
+        left = left + int(round(shift_left * width))
+        side = int(round(size * width))
+        boxes.append(
+            (max(top, 0), min(left + side, w - 1), min(top + side, h - 1), max(left, 0))
+        )
+    return boxes
+
+
+def detect_haar_hog(image_rgb, upsample=DETECTION_UPSAMPLE):
+    h, w = image_rgb.shape[:2]
+    boxes = []
+    for top, right, bottom, left in _haar_boxes(
+        image_rgb, CASCADE_MIN_NEIGHBORS, upsample
+    ):
+        pad = int((right - left) * CASCADE_PADDING)
+        y, x = max(top - pad, 0), max(left - pad, 0)
+        crop = image_rgb[y : min(bottom + pad, h), x : min(right + pad, w)]
+        zoom = CASCADE_FACE_SIZE / float(right - left)
+        crop = cv2.resize(
+            crop,
+            (0, 0),
+            fx=zoom,
+            fy=zoom,
+            interpolation=cv2.INTER_AREA if zoom < 1.0 else cv2.INTER_LINEAR,
+        )
+        # the candidate is already face-sized, so HOG needs no upsampling
+        found = face_recognition.face_locations(crop, 0, model="hog")
+        for box in scale_boxes(found, zoom, image_rgb.shape, (y, x)):
+            # overlapping candidates can confirm the same face twice
+            if all(box_iou(box, kept) < TRACK_IOU_THRESHOLD for kept in boxes):
+                boxes.append(box)
+    return boxes
+
+
+DETECTORS = {
+    "hog": detect_hog,
+    "cnn": detect_cnn,
+    "haar": detect_haar,
+    "haar+hog": detect_haar_hog,
+}
+
+
+def detect_faces(
+    frame_rgb,
+    detection_model=DETECTION_MODEL,
+    scale=DETECTION_SCALE,
+    upsample=DETECTION_UPSAMPLE,
+):
+    detector = DETECTORS.get(detection_model)
+    if detector is None:
+        raise ValueError(
+            f"Unknown detection model {detection_model!r}; "
+            f"expected one of {', '.join(DETECTORS)}"
+        )
+    if scale >= 1.0:
+        return detector(frame_rgb, upsample)
+    small = cv2.resize(
+        frame_rgb, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+    )
+    return scale_boxes(detector(small, upsample), scale, frame_rgb.shape)
+
+
+def detect_regions(
+    frame_rgb,
+    regions,
+    detection_model=DETECTION_MODEL,
+    scale=DETECTION_SCALE,
+    upsample=DETECTION_UPSAMPLE,
+):
+    # searches only the given (top, right, bottom, left) regions and returns
+    # the boxes in frame coordinates; a face found in two overlapping regions
+    # is kept once
+    boxes = []
+    for top, right, bottom, left in regions:
+        # too thin to hold a face, and to survive the downscale
+        if min(bottom - top, right - left) * min(scale, 1.0) < 1:
+            continue
+        crop = frame_rgb[top:bottom, left:right]
+        found = detect_faces(crop, detection_model, scale, upsample)
+        for box in scale_boxes(found, 1.0, frame_rgb.shape, (top, left)):
+            if all(box_iou(box, kept) < TRACK_IOU_THRESHOLD for kept in boxes):
+                boxes.append(box)
+    return boxes
+
+
+def encode_faces(
+    frame_rgb,
+    boxes,
+    landmark_model=ENCODING_LANDMARK_MODEL,
+    num_jitters=ENCODING_NUM_JITTERS,
+):
+    return face_recognition.face_encodings(
+        frame_rgb, boxes, num_jitters=num_jitters, model=landmark_model
+    )
+
+
+def plan_encodings(boxes, skip_boxes=(), max_encodings=None, waiting=()):
+    # faces overlapping an identified track are not encoded again. The rest go
+    # largest first, boosted by how many frames their track has been waiting
+    # so small faces aren't starved by a big one that never matches
+    candidates = []
+    for i, box in enumerate(boxes):
+        if any(box_iou(box, skip) >= TRACK_IOU_THRESHOLD for skip in skip_boxes):
+            continue
+        waited = max(
+            (
+                frames
+                for other, frames in waiting
+                if box_iou(box, other) >= TRACK_IOU_THRESHOLD
+            ),
+            default=0,
+        )
+        area = (box[1] - box[3]) * (box[2] - box[0])
+        candidates.append((area * (1 + waited), i))
+    candidates.sort(reverse=True)
+    if max_encodings is not None:
+        candidates = candidates[:max_encodings]
+    return sorted(i for _, i in candidates)
+
+
+def detect_and_encode(
+    frame_rgb,
+    detection_model=DETECTION_MODEL,
+    detection_scale=DETECTION_SCALE,
+    skip_boxes=(),
+    max_encodings=None,
+    waiting=(),
+    upsample=DETECTION_UPSAMPLE,
+    landmark_model=ENCODING_LANDMARK_MODEL,
+    num_jitters=ENCODING_NUM_JITTERS,
+    regions=None,
+):
+    # encoded lists which boxes the returned encodings belong to
+    if regions is None:
+        boxes = detect_faces(frame_rgb, detection_model, detection_scale, upsample)
+    else:
+        boxes = detect_regions(
+            frame_rgb, regions, detection_model, detection_scale, upsample
+        )
+    encoded = plan_encodings(boxes, skip_boxes, max_encodings, waiting)
+    if not encoded:
+        return boxes, encoded, []
+    encodings = encode_faces(
+        frame_rgb, [boxes[i] for i in encoded], landmark_model, num_jitters
+    )
+    return boxes, encoded, encodings
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import cv2
+
+from core.detection import mirror_box
+
+WINDOW_NAME = "Attendance Session"
+# the preview is redrawn at most this often, whatever rate recognition runs at
+DISPLAY_FPS = 30
+
+
+def draw_tracks(frame_bgr, labels):
+    # boxes are in camera coordinates; the preview is mirrored
+    width = frame_bgr.shape[1]
+    for box, label, color in labels:
+        top, right, bottom, left = mirror_box(box, width)
+        cv2.rectangle(frame_bgr, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(
+            frame_bgr,
+            (left, bottom - 35),
+            (right, bottom),
+            color,
+            cv2.FILLED,
+        )
+        cv2.putText(
+            frame_bgr,
+            label,
+            (left + 6, bottom - 6),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (255, 255, 255),
+            2,
+        )
+
+
+def draw_hud(frame_bgr, roster_label, students, marked, dropped, faces_found, quality):
+    h = frame_bgr.shape[0]
+    cv2.putText(
+        frame_bgr,
+        f"{roster_label}: {students} students",
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.7,
+        (255, 255, 255),
+        2,
+    )
+    cv2.putText(
+        frame_bgr,
+        f"Marked today: {marked}",
+        (10, 60),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.7,
+        (255, 255, 255),
+        2,
+    )
+    cv2.putText(
+        frame_bgr,
+        quality,
+        (10, h - 80),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.6,
+        (255, 255, 255),
+        2,
+    )
+    cv2.putText(
+        frame_bgr,
+        f"Dropped frames: {dropped}",
+        (10, h - 50),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.6,
+        (255, 255, 255),
+        2,
+    )
+    cv2.putText(
+        frame_bgr,
+        "Press ESC to stop",
+        (10, h - 20),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.6,
+        (255, 255, 255),
+        2,
+    )
+
+    if not faces_found:
+        cv2.putText(
+            frame_bgr,
+            "No face detected",
+            (10, 90),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 0, 255),
+            2,
+        )
+
+
+class SessionDisplay:
+    # the recognition loop publishes each processed frame with its results;
+    # the display loop draws whichever is newest when it is time to redraw,
+    # so drawing and showing never hold recognition up
+    def __init__(self, window=WINDOW_NAME):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latest = None
+        self._published = 0
+        self._rendered = 0
+        # reused every redraw: the mirrored preview the overlays go on
+        self._preview = None
+        self.rendered = 0
+        self.seconds = 0.0
+
+    def publish(self, frame_bgr, tracks, hud):
+        # the tracks keep changing after this, so only what is drawn is kept.
+        # The frame itself is never written to again once it is published
+        labels = [(track.box, track.label, track.color) for track in tracks]
+        with self._lock:
+            self._latest = (frame_bgr, labels, hud)
+            self._published += 1
+
+    def render(self):
+        # returns the preview, or None when nothing new was published
+        with self._lock:
+            if self._published == self._rendered:
+                return None
+            self._rendered = self._published
+            frame_bgr, labels, hud = self._latest
+        self._preview = cv2.flip(frame_bgr, 1, dst=self._preview)
+        draw_tracks(self._preview, labels)
+        draw_hud(self._preview, faces_found=bool(labels), **hud)
+        self.rendered += 1
+        return self._preview
+
+    def stats(self):
+        return {
+            "rendered": self.rendered,
+            "ms_per_frame": (
+                self.seconds / self.rendered * 1000 if self.rendered else 0.0
+            ),
+        }
+
+
+def run_displays(displays, workers, stop_event, fps=DISPLAY_FPS):
+    # HighGUI windows only work from the main thread on macOS, so this runs
+    # there and recognition gets threads of its own. ESC, or every worker
+    # finishing, ends it
+    delay = max(int(1000 / fps), 1)
+    while any(worker.is_alive() for worker in workers):
+        for display in displays:
+            start = time.perf_counter()
+            preview = display.render()
+            if preview is not None:
+                cv2.imshow(display.window, preview)
+                display.seconds += time.perf_counter() - start
+        if cv2.waitKey(delay) & 0xFF == 27:
+            stop_event.set()
+    cv2.destroyAllWindows()
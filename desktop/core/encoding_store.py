@@ -0,0 +1,186 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from core.gallery import ENCODING_DIM, GalleryMatcher
+
+ENCODING_MODEL = "dlib_resnet_v1"
+ENCODING_LANDMARK_MODEL = "small"
+ENCODING_NUM_JITTERS = 1
+# faces are encoded as the camera sees them, not as the mirrored preview shows
+# them; a face and its mirror image encode ~0.2 apart
+ENCODING_ORIENTATION = "unmirrored"
+
+
+def encoding_version(landmark_model, num_jitters):
+    return f"{ENCODING_MODEL}/{landmark_model}/j{num_jitters}/{ENCODING_ORIENTATION}"
+
+
+# stored with every row; rows tagged with anything else are stale and get
+# re-embedded by the maintenance tool
+ENCODING_MODEL_VERSION = encoding_version(ENCODING_LANDMARK_MODEL, ENCODING_NUM_JITTERS)
+# what encodings were tagged before the orientation was: .npy files and
+# rows from then were taken from the mirrored preview
+LEGACY_ENCODING_VERSION = (
+    f"{ENCODING_MODEL}/{ENCODING_LANDMARK_MODEL}/j{ENCODING_NUM_JITTERS}"
+)
+BLOB_DTYPE = np.dtype("<f4")
+
+
+def init_encodings_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS encodings (
+            student_id TEXT PRIMARY KEY,
+            sample_count INTEGER NOT NULL,
+            model_version TEXT NOT NULL,
+            data BLOB NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students(student_id)
+        );
+    """
+    )
+    migrate_photo_orientation(cur)
+
+
+def migrate_photo_orientation(cur):
+    # registration saved the mirrored preview as the photo until encodings
+    # were tagged with their orientation. Re-embedding doesn't touch the photo,
+    # so this is recorded once, from the tags, while they still tell
+    cur.execute("PRAGMA table_info(students)")
+    columns = {row[1] for row in cur.fetchall()}
+    if not columns or "photo_mirrored" in columns:
+        return
+    cur.execute(
+        "ALTER TABLE students ADD COLUMN photo_mirrored INTEGER NOT NULL DEFAULT 0"
+    )
+    cur.execute(
+        """
+        UPDATE students SET photo_mirrored = 1
+        WHERE student_id NOT IN (
+            SELECT student_id FROM encodings WHERE model_version LIKE ?
+        )
+    """,
+        (f"%/{ENCODING_ORIENTATION}",),
+    )
+
+
+def save_encodings(cur, student_id, encs_arr, model_version=ENCODING_MODEL_VERSION):
+    samples = np.ascontiguousarray(
+        np.asarray(encs_arr).reshape(-1, ENCODING_DIM), dtype=BLOB_DTYPE
+    )
+    cur.execute(
+        """
+        INSERT OR REPLACE INTO encodings (student_id, sample_count, model_version, data, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+        (
+            student_id,
+            len(samples),
+            model_version,
+            samples.tobytes(),
+            datetime.now().isoformat(),
+        ),
+    )
+
+
+def decode_encodings(blob, sample_count):
+    # zero-copy view over the bytes returned by sqlite3
+    return np.frombuffer(blob, dtype=BLOB_DTYPE).reshape(sample_count, ENCODING_DIM)
+
+
+def encodings_state(cur):
+    # REPLACE gives the row a new rowid, so this changes on add, re-embed
+    # and delete without reading any BLOBs
+    cur.execute(
+        """
+        SELECT COUNT(*), COALESCE(MAX(rowid), 0), COALESCE(SUM(sample_count), 0)
+        FROM encodings
+    """
+    )
+    return cur.fetchone()
+
+
+def encoding_versions(cur):
+    cur.execute("SELECT model_version, COUNT(*) FROM encodings GROUP BY model_version")
+    return dict(cur.fetchall())
+
+
+def load_encoded_gallery(cur, mode="samples", precision="float32"):
+    cur.execute(
+        """
+        SELECT s.student_id, s.name, e.sample_count, e.data
+        FROM students s JOIN encodings e ON e.student_id = s.student_id
+        WHERE e.sample_count > 0
+        ORDER BY s.id
+    """
+    )
+    rows = cur.fetchall()
+
+    counts = np.array([row[2] for row in rows], dtype=np.intp)
+    matrix = np.empty((int(counts.sum()), ENCODING_DIM), dtype=np.float32)
+    offset = 0
+    for _, _, sample_count, blob in rows:
+        matrix[offset : offset + sample_count] = decode_encodings(blob, sample_count)
+        offset += sample_count
+
+    if mode == "mean" and len(rows):
+        starts = np.cumsum(counts) - counts
+        matrix = np.add.reduceat(matrix, starts, axis=0) / counts[:, None]
+        counts = np.ones(len(rows), dtype=np.intp)
+
+    return GalleryMatcher(
+        matrix,
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        owners=np.repeat(np.arange(len(rows)), counts),
+        precision=precision,
+    )
+
+
+def resolve_stored_path(stored_path, directory):
+    if not stored_path:
+        return None
+    if os.path.isabs(stored_path) and os.path.exists(stored_path):
+        return stored_path
+    candidate = os.path.join(directory, os.path.basename(stored_path))
+    return candidate if os.path.exists(candidate) else None
+
+
+def sample_photo_paths(photo_path):
+    # registration stores the first sample frame as the student's photo and
+    # the rest next to it as <photo>_2.jpg, <photo>_3.jpg, ...
+    stem, ext = os.path.splitext(photo_path)
+    paths = [photo_path]
+    while os.path.exists(f"{stem}_{len(paths) + 1}{ext}"):
+        paths.append(f"{stem}_{len(paths) + 1}{ext}")
+    return paths
+
+
+def migrate_npy_encodings(conn, encodings_dir):
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='students'")
+    if cur.fetchone() is None:
+        return 0
+    cur.execute(
+        """
+        SELECT s.student_id, s.encoding_path
+        FROM students s LEFT JOIN encodings e ON e.student_id = s.student_id
+        WHERE e.student_id IS NULL AND COALESCE(s.encoding_path, '') != ''
+    """
+    )
+    migrated = 0
+    for student_id, encoding_path in cur.fetchall():
+        path = resolve_stored_path(encoding_path, encodings_dir)
+        if path is None:
+            continue
+        try:
+            save_encodings(cur, student_id, np.load(path), LEGACY_ENCODING_VERSION)
+            migrated += 1
+        except Exception as e:
+            print(f"Error migrating encoding for {student_id}: {e}")
+    if migrated:
+        conn.commit()
+        print(f"Imported {migrated} .npy encoding files into the database")
+    return migrated
@@ -0,0 +1,330 @@
+import mmap
+
+import numpy as np
+
+ENCODING_DIM = 128
+PRECISIONS = ("float32", "float16", "int8")
+# quantized galleries shortlist this many rows per face by approximate
+# distance, then re-rank them exactly against the float32 encodings
+RERANK_CANDIDATES = 32
+# codes are converted from and to float32 this many rows at a time
+DEQUANTIZE_CHUNK_ROWS = 4096
+
+
+def quantize_encodings(matrix, precision):
+    # a block of rows at a time, so loading a large gallery never holds more
+    # than one block of float32 temporaries
+    if precision not in PRECISIONS[1:]:
+        raise ValueError(f"Unknown gallery precision: {precision}")
+    scale = None
+    if precision == "int8":
+        # symmetric per-dimension scale: x[:, d] ~= codes[:, d] * scale[d]
+        scale = np.zeros(ENCODING_DIM, dtype=np.float32)
+        for start in range(0, len(matrix), DEQUANTIZE_CHUNK_ROWS):
+            chunk = matrix[start : start + DEQUANTIZE_CHUNK_ROWS]
+            np.maximum(scale, np.abs(chunk).max(axis=0), out=scale)
+        scale /= 127.0
+        scale[scale == 0] = 1.0
+    codes = np.empty(matrix.shape, dtype=np.float16 if scale is None else np.int8)
+    for start in range(0, len(matrix), DEQUANTIZE_CHUNK_ROWS):
+        chunk = matrix[start : start + DEQUANTIZE_CHUNK_ROWS]
+        if scale is not None:
+            chunk = np.clip(np.rint(chunk / scale), -127, 127)
+        codes[start : start + len(chunk)] = chunk
+    return codes, scale
+
+
+def is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def release_mapped_pages(array):
+    # drops the pages of a memory-mapped array from this process's resident
+    # set; they stay in the OS cache and are read back on the next access
+    while array is not None and not isinstance(array, mmap.mmap):
+        array = getattr(array, "base", None)
+    if array is not None and hasattr(mmap, "MADV_DONTNEED"):
+        array.madvise(mmap.MADV_DONTNEED)
+
+
+class GalleryMatcher:
+    # stored_rows picks the gallery's rows out of encodings, so a subset of a
+    # memory-mapped gallery re-ranks against the mapped file without copying
+    def __init__(
+        self,
+        encodings,
+        ids,
+        names,
+        owners=None,
+        precision="float32",
+        stored_rows=None,
+    ):
+        stored = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if stored_rows is not None:
+            stored_rows = np.asarray(stored_rows, dtype=np.intp)
+        matrix = stored if stored_rows is None else stored[stored_rows]
+        self.ids = list(ids)
+        self.names = list(names)
+
+        # owners maps each matrix row to its student; rows of one student
+        # must be contiguous so per-student minima can use reduceat
+        if owners is None:
+            owners = np.arange(len(matrix))
+        self.owners = np.asarray(owners, dtype=np.intp)
+        if len(self.owners) != len(matrix):
+            raise ValueError("owners must have one entry per encoding row")
+        self.multi_sample = len(matrix) != len(self.ids)
+        if len(self.owners) > 0:
+            boundaries = np.flatnonzero(self.owners[1:] != self.owners[:-1]) + 1
+            self._starts = np.concatenate(([0], boundaries))
+        else:
+            self._starts = np.zeros(0, dtype=np.intp)
+        if len(self._starts) != len(self.ids):
+            raise ValueError("every student needs at least one contiguous encoding")
+        self.index = None
+
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown gallery precision: {precision}")
+        self.precision = precision
+        if precision == "float32":
+            self._matrix = np.ascontiguousarray(matrix)
+            self._stored, self._stored_rows = None, None
+            self.codes, self.code_scale = None, None
+            self.sq_norms = np.einsum("ij,ij->i", self._matrix, self._matrix)
+        else:
+            # only the codes are kept. The float32 encodings are read back for
+            # re-ranked rows alone, so when they are memory-mapped the rest of
+            # them never has to stay resident
+            self._matrix = None
+            self._stored, self._stored_rows = stored, stored_rows
+            self.codes, self.code_scale = quantize_encodings(matrix, precision)
+            del matrix
+            # quantizing read every row; only re-ranked ones are needed again
+            release_mapped_pages(stored)
+            self.sq_norms = np.empty(len(self.codes), dtype=np.float32)
+            for start, chunk in self._dequantized_chunks():
+                end = start + len(chunk)
+                self.sq_norms[start:end] = np.einsum("ij,ij->i", chunk, chunk)
+
+    @classmethod
+    def from_students(cls, students_data, precision="float32"):
+        samples = [np.atleast_2d(student["encoding"]) for student in students_data]
+        counts = [len(s) for s in samples]
+        if samples:
+            encodings = np.concatenate(samples, axis=0)
+        else:
+            encodings = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        return cls(
+            encodings,
+            [student["student_id"] for student in students_data],
+            [student["name"] for student in students_data],
+            owners=np.repeat(np.arange(len(samples)), counts),
+            precision=precision,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def sample_count(self):
+        return len(self.owners)
+
+    @property
+    def matrix(self):
+        # the float32 encodings; a copy for a quantized subset
+        if self.codes is None:
+            return self._matrix
+        if self._stored_rows is None:
+            return self._stored
+        return self._stored[self._stored_rows]
+
+    def _float_rows(self, rows):
+        if self.codes is None:
+            return self._matrix[rows]
+        if self._stored_rows is not None:
+            rows = self._stored_rows[rows]
+        return self._stored[rows]
+
+    @property
+    def nbytes(self):
+        # working set scanned on every frame, plus the float32 encodings a
+        # quantized gallery re-ranks with unless they are mapped from the
+        # packed cache, where only the re-ranked rows become resident
+        if self.codes is None:
+            return self._matrix.nbytes + self.sq_norms.nbytes + self.owners.nbytes
+        held = self.codes.nbytes + self.sq_norms.nbytes + self.owners.nbytes
+        if self._stored_rows is not None:
+            held += self._stored_rows.nbytes
+        if not is_memory_mapped(self._stored):
+            held += self._stored.nbytes
+        return held
+
+    def sample_counts(self):
+        return np.diff(np.append(self._starts, self.sample_count))
+
+    def row_keys(self):
+        sample_ranks = np.arange(len(self.owners)) - self._starts[self.owners]
+        return [
+            f"{self.ids[owner]}#{rank}"
+            for owner, rank in zip(self.owners.tolist(), sample_ranks.tolist())
+        ]
+
+    def subset(self, student_indices):
+        student_indices = np.asarray(student_indices, dtype=np.intp)
+        counts = self.sample_counts()[student_indices]
+        # gather each selected student's contiguous block of rows
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.repeat(self._starts[student_indices], counts)
+        rows += np.arange(counts.sum()) - offsets
+        if self.codes is None:
+            encodings, stored_rows = self._matrix[rows], None
+        else:
+            encodings = self._stored
+            stored_rows = rows if self._stored_rows is None else self._stored_rows[rows]
+        matcher = GalleryMatcher(
+            encodings,
+            [self.ids[i] for i in student_indices],
+            [self.names[i] for i in student_indices],
+            owners=np.repeat(np.arange(len(student_indices)), counts),
+            precision=self.precision,
+            stored_rows=stored_rows,
+        )
+        if self.index is not None:
+            matcher.attach_index(self.index.subset(rows))
+        return matcher
+
+    def extended(self, students_data):
+        added = GalleryMatcher.from_students(students_data)
+        matcher = GalleryMatcher(
+            np.concatenate([self.matrix, added.matrix]),
+            self.ids + added.ids,
+            self.names + added.names,
+            owners=np.concatenate([self.owners, added.owners + len(self.ids)]),
+            precision=self.precision,
+        )
+        if self.index is not None:
+            matcher.attach_index(self.index.extended(added.matrix))
+        return matcher
+
+    def attach_index(self, index):
+        self.index = index
+
+    def _dequantized_chunks(self):
+        for start in range(0, len(self.codes), DEQUANTIZE_CHUNK_ROWS):
+            chunk = self.codes[start : start + DEQUANTIZE_CHUNK_ROWS]
+            chunk = chunk.astype(np.float32)
+            if self.code_scale is not None:
+                chunk *= self.code_scale
+            yield start, chunk
+
+    def _code_products(self, queries):
+        # q.g against every row, computed from the codes
+        if self.code_scale is not None:
+            # q.(c * scale) == (q * scale).c: the scale goes on the few queries
+            # and einsum widens the int8 codes as it reads them
+            return np.einsum(
+                "ij,kj->ki",
+                self.codes,
+                queries * self.code_scale,
+                dtype=np.float32,
+                casting="unsafe",
+            )
+        # numpy has no float16 matrix product, so rows are widened a block
+        # at a time into one reused buffer
+        products = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        block = np.empty((DEQUANTIZE_CHUNK_ROWS, ENCODING_DIM), dtype=np.float32)
+        for start in range(0, len(self.codes), DEQUANTIZE_CHUNK_ROWS):
+            codes = self.codes[start : start + DEQUANTIZE_CHUNK_ROWS]
+            rows = block[: len(codes)]
+            np.copyto(rows, codes)
+            np.matmul(queries, rows.T, out=products[:, start : start + len(codes)])
+        return products
+
+    def distances(self, queries):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        q_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g, one GEMM for the whole frame
+        sq_dists = q_sq_norms[:, None] + self.sq_norms[None, :]
+        if self.codes is None:
+            sq_dists -= 2.0 * (queries @ self._matrix.T)
+        else:
+            sq_dists -= 2.0 * self._code_products(queries)
+        np.maximum(sq_dists, 0.0, out=sq_dists)
+        return np.sqrt(sq_dists, out=sq_dists)
+
+    def student_distances(self, queries):
+        dists = self.distances(queries)
+        if not self.multi_sample or dists.shape[0] == 0:
+            return dists
+        return np.minimum.reduceat(dists, self._starts, axis=1)
+
+    def match(self, queries, n_probe=None):
+        if self.index is not None:
+            return self._match_indexed(queries, n_probe)
+        if self.codes is not None:
+            return self._match_quantized(queries)
+
+        dists = self.student_distances(queries)
+        n_faces, n_gallery = dists.shape
+        if n_faces == 0 or n_gallery == 0:
+            empty = np.zeros(n_faces)
+            return (
+                np.full(n_faces, -1, dtype=np.intp),
+                empty + np.inf,
+                empty + np.inf,
+            )
+
+        rows = np.arange(n_faces)
+        best_idx = np.argmin(dists, axis=1)
+        best_dist = dists[rows, best_idx]
+        if n_gallery > 1:
+            second = np.partition(dists, 1, axis=1)[:, 1]
+            margin = second - best_dist
+        else:
+            margin = np.full(n_faces, np.inf, dtype=np.float32)
+        return best_idx, best_dist, margin
+
+    def _rank_rows(self, query, rows):
+        # exact float32 distances over a shortlist, reduced per student
+        diffs = self._float_rows(rows) - query
+        dists = np.sqrt(np.einsum("ij,ij->i", diffs, diffs))
+        owners = self.owners[rows]
+        order = np.argsort(dists)
+        first = order[0]
+        others = order[owners[order] != owners[first]]
+        margin = dists[others[0]] - dists[first] if len(others) else np.inf
+        return owners[first], dists[first], margin
+
+    def _match_shortlisted(self, queries, shortlist):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        n_faces = len(queries)
+        best_idx = np.full(n_faces, -1, dtype=np.intp)
+        best_dist = np.full(n_faces, np.inf, dtype=np.float32)
+        margin = np.full(n_faces, np.inf, dtype=np.float32)
+
+        for i, rows in enumerate(shortlist(queries)):
+            if len(rows) > 0:
+                best_idx[i], best_dist[i], margin[i] = self._rank_rows(queries[i], rows)
+        return best_idx, best_dist, margin
+
+    def _match_indexed(self, queries, n_probe=None):
+        return self._match_shortlisted(
+            queries,
+            lambda q: [self.index.candidates(query, n_probe) for query in q],
+        )
+
+    def _match_quantized(self, queries):
+        def shortlist(q):
+            approx = self.distances(q)
+            n_candidates = min(RERANK_CANDIDATES, approx.shape[1])
+            if n_candidates == 0:
+                return [np.zeros(0, dtype=np.intp)] * len(q)
+            if n_candidates == approx.shape[1]:
+                return [np.arange(n_candidates)] * len(q)
+            return np.argpartition(approx, n_candidates - 1, axis=1)[:, :n_candidates]
+
+        return self._match_shortlisted(queries, shortlist)
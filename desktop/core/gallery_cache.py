@@ -0,0 +1,64 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from core.gallery import ENCODING_DIM, GalleryMatcher
+
+# layout: magic | u64 header length | JSON manifest padded to DATA_ALIGN |
+# float32 matrix with one row per encoding, rows grouped by student
+CACHE_MAGIC = b"FAGALRY1"
+DATA_ALIGN = 64
+
+
+def write_packed_gallery(path, matcher, fingerprint):
+    counts = matcher.sample_counts()
+    manifest = {
+        "fingerprint": fingerprint,
+        "rows": matcher.sample_count,
+        "ids": matcher.ids,
+        "names": matcher.names,
+        "counts": counts.tolist(),
+    }
+    header = json.dumps(manifest).encode("utf-8")
+    prefix_len = len(CACHE_MAGIC) + 8
+    padding = -(prefix_len + len(header)) % DATA_ALIGN
+    header += b" " * padding
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(np.ascontiguousarray(matcher.matrix, dtype="<f4").tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_packed_gallery(path, fingerprint, precision="float32"):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            return None
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        manifest = json.loads(f.read(header_len))
+    if manifest["fingerprint"] != fingerprint:
+        return None
+
+    rows = manifest["rows"]
+    if rows > 0:
+        matrix = np.memmap(
+            path,
+            dtype="<f4",
+            mode="r",
+            offset=len(CACHE_MAGIC) + 8 + header_len,
+            shape=(rows, ENCODING_DIM),
+        )
+    else:
+        matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+    owners = np.repeat(np.arange(len(manifest["ids"])), manifest["counts"])
+    return GalleryMatcher(
+        matrix, manifest["ids"], manifest["names"], owners=owners, precision=precision
+    )
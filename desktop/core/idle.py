@@ -0,0 +1,85 @@
+import time
+
+# with neither motion nor a face for this long, the session goes idle
+IDLE_AFTER_SECONDS = 30.0
+# while idle, only one camera frame is decoded and checked for motion this
+# often; the first one that moved wakes the session back to the full rate.
+# Must stay below the frame grabber's read timeout
+IDLE_FRAME_INTERVAL = 0.5
+
+
+class IdleMonitor:
+    # cpu_clock returns the CPU seconds used so far by whatever is measured;
+    # the whole process by default
+    def __init__(self, idle_after=IDLE_AFTER_SECONDS, cpu_clock=time.process_time):
+        self.idle_after = idle_after
+        self._cpu_clock = cpu_clock
+        self.idle = False
+        now = time.monotonic()
+        self._last_activity = now
+        self._mode_since = now
+        self._mode_cpu = cpu_clock()
+        # woke from idle and no one recognized yet
+        self._woke_at = None
+        self.wakeups = 0
+        self.seconds = {"active": 0.0, "idle": 0.0}
+        self.cpu_seconds = {"active": 0.0, "idle": 0.0}
+        # seconds to a confirmed identity: from a face's first detection while
+        # active, and from the motion that woke the session when idle
+        self.recognition_delays = {"active": [], "idle": []}
+
+    def _account(self, now):
+        mode = "idle" if self.idle else "active"
+        cpu = self._cpu_clock()
+        self.seconds[mode] += now - self._mode_since
+        self.cpu_seconds[mode] += cpu - self._mode_cpu
+        self._mode_since, self._mode_cpu = now, cpu
+
+    def _switch(self, now):
+        self._account(now)
+        self.idle = not self.idle
+
+    def activity(self):
+        # returns True when this woke the session up
+        now = time.monotonic()
+        self._last_activity = now
+        if not self.idle:
+            return False
+        self._switch(now)
+        self._woke_at = now
+        self.wakeups += 1
+        return True
+
+    def update(self):
+        # returns True when the session just went idle
+        now = time.monotonic()
+        if self.idle or now - self._last_activity < self.idle_after:
+            return False
+        self._switch(now)
+        self._woke_at = None
+        return True
+
+    def recognized(self, track):
+        now = time.monotonic()
+        # only a face that showed up soon after waking is timed from the wake
+        woke_at, self._woke_at = self._woke_at, None
+        if woke_at is not None and track.started_at - woke_at < self.idle_after:
+            self.recognition_delays["idle"].append(now - woke_at)
+        else:
+            self.recognition_delays["active"].append(now - track.started_at)
+
+    def stats(self):
+        # the current period counts up to now
+        self._account(time.monotonic())
+        stats = {"idle_after": self.idle_after, "wakeups": self.wakeups}
+        for mode in ("active", "idle"):
+            seconds = self.seconds[mode]
+            delays = self.recognition_delays[mode]
+            stats[mode] = {
+                "seconds": seconds,
+                "cpu_seconds": self.cpu_seconds[mode],
+                "cpu_ratio": self.cpu_seconds[mode] / seconds if seconds else 0.0,
+                "recognitions": len(delays),
+                "mean_delay": sum(delays) / len(delays) if delays else None,
+            }
+        return stats
@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(sys.executable)
+    sys.path.insert(0, os.path.join(BASE_DIR, "desktop"))
+else:
+    BASE_DIR = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.encoding_store import (
+    init_encodings_table,
+    resolve_stored_path,
+    sample_photo_paths,
+    save_encodings,
+)
+from core.profiles import load_profile, profile_version
+
+DB_DIR = os.path.join(BASE_DIR, "db")
+DB_PATH = os.path.join(DB_DIR, "attendance.db")
+PHOTOS_DIR = os.path.join(BASE_DIR, "data", "photos")
+ENCODINGS_DIR = os.path.join(BASE_DIR, "data", "encodings")
+DETECTION_MODEL = "hog"
+COMMIT_EVERY = 50
+# the sample frames stored next to a student's photo
+SAMPLE_PHOTO_PATTERN = re.compile(r"^(.*)_\d+(\.jpg)$")
+
+_face_recognition = None
+
+
+def _init_worker():
+    # each worker loads the dlib models once, not once per photo
+    global _face_recognition
+    import face_recognition
+
+    _face_recognition = face_recognition
+
+
+def embed_photos(student_id, photo_paths, profile, mirrored=False):
+    # one encoding per sample photo, like registration; a photo without
+    # exactly one face is skipped as long as another one encodes
+    start = time.perf_counter()
+    samples, errors = [], []
+    for photo_path in photo_paths:
+        try:
+            image = _face_recognition.load_image_file(photo_path)
+            if mirrored:
+                image = np.ascontiguousarray(image[:, ::-1])
+            boxes = _face_recognition.face_locations(image, model=DETECTION_MODEL)
+            if len(boxes) != 1:
+                errors.append(
+                    f"{os.path.basename(photo_path)}: expected one face, "
+                    f"found {len(boxes)}"
+                )
+                continue
+            samples.extend(
+                _face_recognition.face_encodings(
+                    image,
+                    boxes,
+                    num_jitters=profile["num_jitters"],
+                    model=profile["landmark_model"],
+                )
+            )
+        except Exception as e:
+            errors.append(f"{os.path.basename(photo_path)}: {e}")
+    encodings = np.asarray(samples, dtype=np.float32) if samples else None
+    return {
+        "student_id": student_id,
+        "encodings": encodings,
+        "photos": len(photo_paths),
+        "error": "; ".join(errors) or None,
+        "pid": os.getpid(),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def open_database():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='students'")
+    if cur.fetchone() is None:
+        conn.close()
+        return None
+    init_encodings_table(cur)
+    conn.commit()
+    return conn
+
+
+def find_stale(cur, version, force=False):
+    cur.execute(
+        """
+        SELECT s.student_id, s.photo_path, s.photo_mirrored, e.model_version
+        FROM students s LEFT JOIN encodings e ON e.student_id = s.student_id
+        ORDER BY s.id
+    """
+    )
+    stale, missing_photo = [], []
+    for student_id, photo_path, mirrored, model_version in cur.fetchall():
+        if not force and model_version == version:
+            continue
+        path = resolve_stored_path(photo_path, PHOTOS_DIR)
+        if path is None:
+            missing_photo.append(student_id)
+            continue
+        stale.append((student_id, sample_photo_paths(path), bool(mirrored)))
+    return stale, missing_photo
+
+
+def find_orphans(cur):
+    cur.execute("SELECT photo_path, encoding_path FROM students")
+    referenced = {
+        os.path.basename(path) for row in cur.fetchall() for path in row if path
+    }
+    orphans = []
+    for directory, suffix in ((PHOTOS_DIR, ".jpg"), (ENCODINGS_DIR, ".npy")):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(suffix) or name in referenced:
+                continue
+            sample = SAMPLE_PHOTO_PATTERN.match(name)
+            if sample and "".join(sample.groups()) in referenced:
+                continue
+            orphans.append(os.path.join(directory, name))
+    return orphans
+
+
+def reembed(workers, force=False):
+    conn = open_database()
+    if conn is None:
+        print("No students table found.")
+        return
+    cur = conn.cursor()
+    # re-embedded with the settings of the recognition profile in use
+    _, profile = load_profile()
+    version = profile_version(profile)
+    stale, missing_photo = find_stale(cur, version, force)
+    for student_id in missing_photo:
+        print(f"Skipping {student_id}: stored photo not found")
+    if not stale:
+        print(f"All encodings are up to date ({version}).")
+        conn.close()
+        return
+
+    print(f"Re-embedding {len(stale)} students with {workers} workers ({version})")
+    per_worker = defaultdict(lambda: {"done": 0, "failed": 0, "seconds": 0.0})
+    updated = 0
+    photos = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(embed_photos, sid, paths, profile, mirrored)
+            for sid, paths, mirrored in stale
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            worker = per_worker[result["pid"]]
+            worker["seconds"] += result["seconds"]
+            photos += result["photos"]
+            if result["encodings"] is None:
+                worker["failed"] += 1
+                print(f"Failed {result['student_id']}: {result['error']}")
+                continue
+            worker["done"] += 1
+            if result["error"] is not None:
+                print(f"Skipped photos of {result['student_id']}: {result['error']}")
+            # only the parent writes, so SQLite sees a single writer
+            save_encodings(cur, result["student_id"], result["encodings"], version)
+            updated += 1
+            if updated % COMMIT_EVERY == 0:
+                conn.commit()
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"\nUpdated {updated}/{len(stale)} students from {photos} photos in "
+        f"{elapsed:.1f}s ({photos / elapsed:.1f} photos/s overall)"
+    )
+    print(f"{'worker':>8} {'done':>6} {'failed':>6} {'busy s':>8} {'students/s':>10}")
+    for pid, worker in sorted(per_worker.items()):
+        processed = worker["done"] + worker["failed"]
+        rate = processed / worker["seconds"] if worker["seconds"] else 0.0
+        print(
+            f"{pid:>8} {worker['done']:>6} {worker['failed']:>6} "
+            f"{worker['seconds']:>8.1f} {rate:>10.2f}"
+        )
+
+
+def prune(dry_run=False):
+    conn = open_database()
+    if conn is None:
+        print("No students table found.")
+        return
+    orphans = find_orphans(conn.cursor())
+    conn.close()
+
+    freed = 0
+    for path in orphans:
+        size = os.path.getsize(path)
+        if dry_run:
+            print(f"Would delete {path}")
+        else:
+            os.remove(path)
+            print(f"Deleted {path}")
+        freed += size
+    verb = "Would free" if dry_run else "Freed"
+    print(f"{len(orphans)} orphaned files. {verb} {freed / 1024:.0f} KiB.")
+
+
+def status():
+    conn = open_database()
+    if conn is None:
+        print("No students table found.")
+        return
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COALESCE(e.model_version, '(none)'), COUNT(*)
+        FROM students s LEFT JOIN encodings e ON e.student_id = s.student_id
+        GROUP BY 1 ORDER BY 2 DESC
+    """
+    )
+    profile_name, profile = load_profile()
+    version = profile_version(profile)
+    print(f"Current encoding version: {version} ({profile_name} profile)")
+    for model_version, count in cur.fetchall():
+        print(f"  {model_version}: {count} students")
+    stale, missing_photo = find_stale(cur, version)
+    print(f"Stale and re-embeddable: {len(stale)}")
+    print(f"Stale without a stored photo: {len(missing_photo)}")
+    print(f"Orphaned files: {len(find_orphans(cur))}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the face gallery")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="show encoding versions and orphans")
+    reembed_parser = commands.add_parser(
+        "reembed", help="regenerate stale encodings from stored photos"
+    )
+    reembed_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    reembed_parser.add_argument(
+        "--force", action="store_true", help="re-embed up-to-date students too"
+    )
+    prune_parser = commands.add_parser(
+        "prune", help="delete photos and .npy files no student references"
+    )
+    prune_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status()
+    elif args.command == "reembed":
+        reembed(args.workers, args.force)
+    elif args.command == "prune":
+        prune(args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
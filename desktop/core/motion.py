@@ -0,0 +1,83 @@
+import time
+
+import cv2
+
+MOTION_THUMBNAIL_SIZE = (64, 48)
+# a thumbnail pixel counts as changed when its grey level moved this much
+MOTION_PIXEL_DELTA = 25
+# detection is skipped while less than this share of pixels has changed since
+# the frame that was last sent to detection
+MOTION_MIN_CHANGED = 0.01
+# run a full check at least this often even when nothing seems to move
+MOTION_FORCE_EVERY = 30
+
+
+class MotionGate:
+    def __init__(
+        self,
+        min_changed=MOTION_MIN_CHANGED,
+        force_every=MOTION_FORCE_EVERY,
+        size=MOTION_THUMBNAIL_SIZE,
+    ):
+        self.min_changed = min_changed
+        self.force_every = force_every
+        self.size = size
+        # thumbnails and their difference are computed into buffers kept
+        # across frames instead of fresh arrays per frame
+        self._small = None
+        self._gray = None
+        self._current = None
+        self._reference = None
+        self._diff = None
+        self._since_check = 0
+        # whether the last check saw the scene change, as opposed to passing a
+        # frame because it was forced to
+        self.moved = False
+        self.passed = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    def _thumbnail(self, frame_bgr):
+        self._small = cv2.resize(
+            frame_bgr, self.size, dst=self._small, interpolation=cv2.INTER_AREA
+        )
+        self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        # smooths sensor noise so it doesn't read as motion
+        self._current = cv2.GaussianBlur(self._gray, (3, 3), 0, dst=self._current)
+
+    def check(self, frame_bgr, force=False):
+        start = time.perf_counter()
+        self._thumbnail(frame_bgr)
+        changed = (
+            force
+            or self._reference is None
+            or self._since_check + 1 >= self.force_every
+        )
+        self.moved = False
+        if not changed:
+            self._diff = cv2.absdiff(self._current, self._reference, dst=self._diff)
+            cv2.threshold(
+                self._diff, MOTION_PIXEL_DELTA, 255, cv2.THRESH_BINARY, dst=self._diff
+            )
+            changed = cv2.countNonZero(self._diff) >= self.min_changed * self._diff.size
+            self.moved = changed
+
+        if changed:
+            # the old reference becomes the buffer for the next thumbnail
+            self._reference, self._current = self._current, self._reference
+            self._since_check = 0
+            self.passed += 1
+        else:
+            self._since_check += 1
+            self.skipped += 1
+        self.seconds += time.perf_counter() - start
+        return changed
+
+    def stats(self):
+        total = self.passed + self.skipped
+        return {
+            "passed": self.passed,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / total if total else 0.0,
+            "seconds": self.seconds,
+        }
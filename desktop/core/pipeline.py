@@ -0,0 +1,235 @@
+import multiprocessing
+import os
+import queue
+import time
+from collections import defaultdict, deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from core.gallery import ENCODING_DIM
+
+# spawn on every platform: forking a process that already runs the camera,
+# Tk and capture threads is unsafe on macOS
+START_METHOD = "spawn"
+# a second slot per worker lets the next frame wait in the queue while the
+# worker is still busy, so workers never idle between frames
+SLOTS_PER_WORKER = 2
+READY_TIMEOUT = 60.0
+
+
+def _worker_main(tasks, results, options):
+    # importing face_recognition loads the dlib models; that happens once
+    # per worker process, not once per frame
+    from core.detection import detect_and_encode
+
+    attached = {}
+    results.put(("ready", os.getpid()))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, shm_name, shape, frame_options = task
+        if shm_name not in attached:
+            attached[shm_name] = shared_memory.SharedMemory(name=shm_name)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=attached[shm_name].buf)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        error = None
+        try:
+            # per-frame options (e.g. the current detection scale) win over
+            # the defaults the pipeline was started with
+            boxes, encoded, encodings = detect_and_encode(
+                frame, **{**options, **frame_options}
+            )
+        except Exception as e:
+            boxes, encoded, encodings, error = [], [], [], str(e)
+        # drop the view before the slot can be handed back and rewritten
+        del frame
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        results.put(
+            (
+                "done",
+                seq,
+                boxes,
+                encoded,
+                encodings,
+                error,
+                os.getpid(),
+                time.perf_counter() - start,
+                time.process_time() - cpu_start,
+            )
+        )
+    for shm in attached.values():
+        shm.close()
+
+
+class RecognitionPipeline:
+    def __init__(self, workers, **options):
+        if workers < 1:
+            raise ValueError("RecognitionPipeline needs at least one worker")
+        context = multiprocessing.get_context(START_METHOD)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(self._tasks, self._results, options),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._slots = []
+        self._frames = []
+        self._free = deque()
+        self._in_flight = {}
+        self._finished = {}
+        self._next_seq = 0
+        self._next_out = 0
+        self._ready = set()
+        self.submitted = 0
+        self.completed = 0
+        # CPU the workers spent on frames, for the session's own CPU figures
+        self.cpu_seconds = 0.0
+        self.per_worker = defaultdict(
+            lambda: {"frames": 0, "seconds": 0.0, "cpu_seconds": 0.0}
+        )
+
+    @property
+    def workers(self):
+        return len(self._processes)
+
+    def _check_workers(self):
+        # a worker that died (OOM, a crash in dlib) never returns the frame it
+        # held, and results would wait for it forever
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Recognition worker {process.pid} exited "
+                    f"(exit code {process.exitcode})"
+                )
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while len(self._ready) < self.workers:
+            # one that dies while loading the models never reports ready
+            if not all(process.is_alive() for process in self._processes):
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._receive(min(remaining, 1.0))
+        return True
+
+    def _allocate(self, shape):
+        nbytes = int(np.prod(shape))
+        for _ in range(self.workers * SLOTS_PER_WORKER):
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._slots.append(shm)
+            self._frames.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+            self._free.append(len(self._slots) - 1)
+
+    def has_free_slot(self):
+        self._check_workers()
+        return not self._slots or bool(self._free)
+
+    def submit(self, frame, context=None, color_conversion=None, **frame_options):
+        if not self._slots:
+            self._allocate(frame.shape)
+        if frame.shape != self._frames[0].shape:
+            raise ValueError(
+                f"Frame shape {frame.shape} does not match the pipeline's "
+                f"{self._frames[0].shape}"
+            )
+        if not self._free:
+            return False
+        slot = self._free.popleft()
+        # the one copy per frame: straight into memory the workers share. A
+        # camera frame is converted to RGB on the way in rather than first
+        # into an array of its own
+        if color_conversion is None:
+            np.copyto(self._frames[slot], frame)
+        else:
+            cv2.cvtColor(frame, color_conversion, dst=self._frames[slot])
+        seq = self._next_seq
+        self._next_seq += 1
+        self._in_flight[seq] = (slot, context)
+        self._tasks.put((seq, self._slots[slot].name, frame.shape, frame_options))
+        self.submitted += 1
+        return True
+
+    def _receive(self, timeout):
+        try:
+            if timeout > 0:
+                message = self._results.get(timeout=timeout)
+            else:
+                message = self._results.get_nowait()
+        except queue.Empty:
+            return False
+        if message[0] == "ready":
+            self._ready.add(message[1])
+            return True
+
+        _, seq, boxes, encoded, encodings, error, pid, seconds, cpu = message
+        slot, context = self._in_flight.pop(seq)
+        self._free.append(slot)
+        if error is not None:
+            print(f"Recognition worker {pid} failed on a frame: {error}")
+        worker = self.per_worker[pid]
+        worker["frames"] += 1
+        worker["seconds"] += seconds
+        worker["cpu_seconds"] += cpu
+        self.cpu_seconds += cpu
+        self._finished[seq] = (context, boxes, encoded, encodings)
+        return True
+
+    def results(self, timeout=0.0):
+        # waits up to timeout for the first message, then drains the rest
+        self._check_workers()
+        if self._in_flight:
+            self._receive(timeout)
+        while self._receive(0.0):
+            pass
+
+        # workers finish out of order; hand frames back in submission order
+        ready = []
+        while self._next_out in self._finished:
+            ready.append(self._finished.pop(self._next_out))
+            self._next_out += 1
+        self.completed += len(ready)
+        return ready
+
+    def pending(self):
+        return len(self._in_flight) + len(self._finished)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "per_worker": dict(self.per_worker),
+        }
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self._frames.clear()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots.clear()
+        self._free.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(sys.executable)
+    sys.path.insert(0, os.path.join(BASE_DIR, "desktop"))
+else:
+    BASE_DIR = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.encoding_store import encoding_version, encoding_versions
+
+PROFILE_PATH = os.path.join(BASE_DIR, "data", "recognition_profile.json")
+DB_PATH = os.path.join(BASE_DIR, "db", "attendance.db")
+# most accurate first; calibration picks the first one within the target.
+# "fast" only finds faces of ~160px and up in a 720p frame, so it suits a
+# kiosk where students step up to the camera. Landmark model and jitters
+# change the encodings themselves: the gallery has to be re-embedded when
+# switching to a profile that encodes differently (fast <-> balanced doesn't)
+RECOGNITION_PROFILES = {
+    "accurate": {
+        "detection_scale": 1.0,
+        "upsample": 1,
+        "landmark_model": "large",
+        "num_jitters": 3,
+    },
+    "balanced": {
+        "detection_scale": 0.5,
+        "upsample": 1,
+        "landmark_model": "small",
+        "num_jitters": 1,
+    },
+    "fast": {
+        "detection_scale": 0.5,
+        "upsample": 0,
+        "landmark_model": "small",
+        "num_jitters": 1,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+CALIBRATION_FRAMES = 20
+CALIBRATION_TARGET_MS = 150.0
+# faces encoded per frame while timing; matches the session's encoding budget
+CALIBRATION_MAX_ENCODINGS = 2
+
+
+def profile_version(settings):
+    return encoding_version(settings["landmark_model"], settings["num_jitters"])
+
+
+def stored_encoding_version(path=DB_PATH):
+    # what most of the gallery is encoded with; None without a gallery
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        versions = encoding_versions(conn.cursor())
+    except sqlite3.OperationalError:
+        versions = {}
+    conn.close()
+    return max(versions, key=versions.get) if versions else None
+
+
+def load_profile(path=PROFILE_PATH):
+    name = DEFAULT_PROFILE
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                name = json.load(f)["profile"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable recognition profile {path}: {e}")
+            name = DEFAULT_PROFILE
+        if name not in RECOGNITION_PROFILES:
+            print(f"Unknown recognition profile {name!r}; using {DEFAULT_PROFILE}")
+            name = DEFAULT_PROFILE
+    return name, dict(RECOGNITION_PROFILES[name])
+
+
+def save_profile(name, calibration=None, path=PROFILE_PATH):
+    if name not in RECOGNITION_PROFILES:
+        raise ValueError(
+            f"Unknown recognition profile {name!r}; "
+            f"expected one of {', '.join(RECOGNITION_PROFILES)}"
+        )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {"profile": name, "saved": datetime.now().isoformat()}
+    if calibration is not None:
+        record["calibration"] = calibration
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+
+
+def read_frames(source, count):
+    frames = []
+    if source is not None and os.path.isdir(source):
+        for name in sorted(os.listdir(source))[:count]:
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                frames.append(image)
+    else:
+        if source is None:
+            cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
+        else:
+            cap = cv2.VideoCapture(source)
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+
+
+def time_profile(frames, settings, detection_model, max_encodings):
+    # imported here so reading the profile doesn't load the dlib models
+    from core.detection import detect_and_encode
+
+    # the first call loads the models, so it is left out
+    detect_and_encode(frames[0], detection_model, **settings)
+    seconds, faces = [], 0
+    for frame in frames:
+        start = time.perf_counter()
+        boxes, _, _ = detect_and_encode(
+            frame, detection_model, max_encodings=max_encodings, **settings
+        )
+        seconds.append(time.perf_counter() - start)
+        faces += len(boxes)
+    return float(np.mean(seconds)) * 1000, float(np.max(seconds)) * 1000, faces
+
+
+def calibrate(frames, target_ms, detection_model, max_encodings, version=None):
+    # with a version, only profiles that encode like that are selected, so
+    # calibrating never leaves the gallery unmatchable until a reembed
+    eligible = [
+        name
+        for name, settings in RECOGNITION_PROFILES.items()
+        if version is None or profile_version(settings) == version
+    ]
+    if not eligible:
+        # no profile encodes like that (e.g. a legacy gallery): it has to be
+        # re-embedded whichever is chosen
+        eligible = list(RECOGNITION_PROFILES)
+    timings = {}
+    chosen = None
+    passed_over = []
+    print(f"{'profile':<9} {'ms/frame':>9} {'max ms':>7} {'faces':>6}")
+    for name, settings in RECOGNITION_PROFILES.items():
+        mean_ms, max_ms, faces = time_profile(
+            frames, settings, detection_model, max_encodings
+        )
+        timings[name] = {"ms_per_frame": mean_ms, "max_ms": max_ms, "faces": faces}
+        print(f"{name:<9} {mean_ms:>9.1f} {max_ms:>7.1f} {faces:>6}")
+        if chosen is None and mean_ms <= target_ms:
+            if name in eligible:
+                chosen = name
+            else:
+                passed_over.append(name)
+    if passed_over:
+        print(
+            f"Not selecting {', '.join(passed_over)}: encodes differently from the "
+            "stored gallery; pass --allow-reembed to consider it"
+        )
+    if chosen is None:
+        chosen = eligible[-1]
+        print(f"No profile meets {target_ms:.0f}ms per frame; using the fastest")
+    return chosen, timings
+
+
+def main():
+    from core.detection import DETECTION_MODEL
+
+    parser = argparse.ArgumentParser(description="Choose the recognition profile")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="print the profiles and the one in use")
+    use_parser = commands.add_parser("use", help="select a profile by name")
+    use_parser.add_argument("profile", choices=list(RECOGNITION_PROFILES))
+    calibrate_parser = commands.add_parser(
+        "calibrate",
+        help="time every profile on this machine and select the most accurate "
+        "one within the target",
+    )
+    calibrate_parser.add_argument(
+        "--source", help="video file or image directory; the camera by default"
+    )
+    calibrate_parser.add_argument("--frames", type=int, default=CALIBRATION_FRAMES)
+    calibrate_parser.add_argument(
+        "--target-ms", type=float, default=CALIBRATION_TARGET_MS
+    )
+    calibrate_parser.add_argument(
+        "--max-encodings", type=int, default=CALIBRATION_MAX_ENCODINGS
+    )
+    calibrate_parser.add_argument("--detection-model", default=DETECTION_MODEL)
+    calibrate_parser.add_argument(
+        "--allow-reembed",
+        action="store_true",
+        help="also select profiles that encode differently from the stored "
+        "gallery, which then has to be re-embedded",
+    )
+    calibrate_parser.add_argument(
+        "--dry-run", action="store_true", help="report without saving the choice"
+    )
+    args = parser.parse_args()
+
+    if args.command == "show":
+        current, _ = load_profile()
+        for name, settings in RECOGNITION_PROFILES.items():
+            marker = "*" if name == current else " "
+            print(
+                f"{marker} {name:<9} detect {settings['detection_scale']:.2f}x, "
+                f"upsample {settings['upsample']}, encodings "
+                f"{profile_version(settings)}"
+            )
+    elif args.command == "use":
+        save_profile(args.profile)
+        print(f"Recognition profile: {args.profile}")
+    elif args.command == "calibrate":
+        frames = read_frames(args.source, args.frames)
+        if not frames:
+            print("No frames to calibrate with.")
+            return
+        print(
+            f"Timing {len(RECOGNITION_PROFILES)} profiles on {len(frames)} frames "
+            f"({frames[0].shape[1]}x{frames[0].shape[0]}), target "
+            f"{args.target_ms:.0f}ms per frame"
+        )
+        chosen, timings = calibrate(
+            frames,
+            args.target_ms,
+            args.detection_model,
+            args.max_encodings,
+            None if args.allow_reembed else stored_encoding_version(),
+        )
+        if not any(timing["faces"] for timing in timings.values()):
+            print("No faces in the frames: the timings cover detection only")
+        previous, settings = load_profile()
+        if args.dry_run:
+            print(f"Would select: {chosen}")
+            return
+        save_profile(
+            chosen,
+            {"target_ms": args.target_ms, "frames": len(frames), "profiles": timings},
+        )
+        print(f"Selected: {chosen}")
+        if profile_version(RECOGNITION_PROFILES[chosen]) != profile_version(settings):
+            print(
+                f"{chosen} encodes differently from {previous}; run "
+                "maintenance.py reembed so the gallery matches"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+QOS_TARGET_FPS = 10.0
+# detection scales the controller steps through, best quality first
+QOS_SCALES = (1.0, 0.75, 0.5, 0.375, 0.25)
+QOS_SCALE_BOUNDS = (0.25, 1.0)
+# detect on every Nth frame; tracks carry the faces in between
+QOS_INTERVAL_BOUNDS = (1, 4)
+# frames to wait after a change before judging it; with this smoothing the
+# frames from before the change weigh under 4% by then
+QOS_SETTLE_FRAMES = 15
+QOS_SMOOTHING = 0.2
+# degrade below target * QOS_SLOW, improve above target * QOS_FAST
+QOS_SLOW = 0.9
+QOS_FAST = 1.4
+
+
+class QualityController:
+    def __init__(
+        self,
+        target_fps=QOS_TARGET_FPS,
+        scale=QOS_SCALE_BOUNDS[1],
+        scale_bounds=QOS_SCALE_BOUNDS,
+        interval_bounds=QOS_INTERVAL_BOUNDS,
+    ):
+        low, high = scale_bounds
+        self.scales = [s for s in QOS_SCALES if low <= s <= high] or [high]
+        self.target_fps = target_fps
+        self.min_interval, self.max_interval = interval_bounds
+        self.level = min(
+            range(len(self.scales)), key=lambda i: abs(self.scales[i] - scale)
+        )
+        self.interval = self.min_interval
+        self._since_detection = 0
+        self._since_change = 0
+        self._frame_seconds = None
+        self.adjustments = 0
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    @property
+    def fps(self):
+        return 1.0 / self._frame_seconds if self._frame_seconds else 0.0
+
+    def detection_due(self):
+        # counts every frame offered, detected or not
+        self._since_detection += 1
+        if self._since_detection >= self.interval:
+            self._since_detection = 0
+            return True
+        return False
+
+    def record(self, frame_seconds):
+        if self._frame_seconds is None:
+            self._frame_seconds = frame_seconds
+        else:
+            self._frame_seconds += QOS_SMOOTHING * (frame_seconds - self._frame_seconds)
+        self._since_change += 1
+        if self._since_change < QOS_SETTLE_FRAMES:
+            return
+
+        # degrade by shrinking the detection image before skipping frames,
+        # and recover in the opposite order
+        fps = self.fps
+        if fps < self.target_fps * QOS_SLOW:
+            if self.level < len(self.scales) - 1:
+                self.level += 1
+            elif self.interval < self.max_interval:
+                self.interval += 1
+            else:
+                return
+        elif fps > self.target_fps * QOS_FAST:
+            if self.interval > self.min_interval:
+                self.interval -= 1
+            elif self.level > 0:
+                self.level -= 1
+            else:
+                return
+        else:
+            return
+        self.adjustments += 1
+        self._since_change = 0
+
+    def describe(self):
+        return f"detect {self.scale:.2f}x every {self.interval} frame(s)"
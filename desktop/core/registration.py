@@ -1,8 +1,8 @@
 import cv2
-import face_recognition
 import numpy as np
 import sqlite3
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 import tkinter as tk
@@ -19,13 +19,32 @@ else:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ui.theme import *
+from core.detection import detect_faces, encode_faces, mirror_box
+from core.profiles import load_profile, profile_version
+from core.encoding_store import (
+    ENCODING_MODEL_VERSION,
+    encodings_state,
+    init_encodings_table,
+    load_encoded_gallery,
+    migrate_npy_encodings,
+    save_encodings,
+)
 
 DB_DIR = os.path.join(BASE_DIR, "db")
 DB_PATH = os.path.join(DB_DIR, "attendance.db")
 PHOTOS_DIR = os.path.join(BASE_DIR, "data", "photos")
 ENCODINGS_DIR = os.path.join(BASE_DIR, "data", "encodings")
 SAMPLES_PER_STUDENT = 5
+# see DETECTION_MODEL in attendance.py; the detection scale and encoding
+# settings come from the recognition profile, as in attendance
 DETECTION_MODEL = "hog"
+# a new registration is flagged when the median distance of its samples to an
+# enrolled student is within this; stricter than the attendance TOLERANCE
+DUPLICATE_TOLERANCE = 0.5
+MAX_DUPLICATES_REPORTED = 3
+
+_duplicate_gallery = {"state": None, "matcher": None}
+_duplicate_gallery_lock = threading.Lock()
 
 Path(DB_DIR).mkdir(parents=True, exist_ok=True)
 Path(PHOTOS_DIR).mkdir(parents=True, exist_ok=True)
@@ -44,14 +63,35 @@ def init_database():
             email TEXT,
             photo_path TEXT,
             encoding_path TEXT,
-            date_registered TEXT NOT NULL
+            date_registered TEXT NOT NULL,
+            department TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1,
+            photo_mirrored INTEGER NOT NULL DEFAULT 0
         );
     """
     )
+    migrate_students_table(cur)
+    init_encodings_table(cur)
     conn.commit()
+    # students with only a legacy .npy file would be missing from the
+    # duplicate check until an attendance session imported them
+    migrate_npy_encodings(conn, ENCODINGS_DIR)
     conn.close()
 
 
+def migrate_students_table(cur):
+    cur.execute("PRAGMA table_info(students)")
+    columns = {row[1] for row in cur.fetchall()}
+    if not columns:
+        return
+    if "department" not in columns:
+        cur.execute("ALTER TABLE students ADD COLUMN department TEXT")
+    if "is_active" not in columns:
+        cur.execute(
+            "ALTER TABLE students ADD COLUMN is_active INTEGER NOT NULL DEFAULT 1"
+        )
+
+
 def student_exists(student_id: str) -> bool:
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -61,6 +101,46 @@ def student_exists(student_id: str) -> bool:
     return row is not None
 
 
+def load_duplicate_gallery():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    state = encodings_state(cur)
+    with _duplicate_gallery_lock:
+        if _duplicate_gallery["state"] != state:
+            _duplicate_gallery["matcher"] = load_encoded_gallery(cur)
+            _duplicate_gallery["state"] = state
+        matcher = _duplicate_gallery["matcher"]
+    conn.close()
+    return matcher
+
+
+def find_duplicate_faces(encs_arr, tolerance=DUPLICATE_TOLERANCE):
+    matcher = load_duplicate_gallery()
+    if len(matcher) == 0:
+        return []
+
+    # (samples, students) closest-sample distances; the median keeps a single
+    # odd capture from either causing or hiding a match
+    dists = np.median(matcher.student_distances(encs_arr), axis=0)
+    candidates = np.flatnonzero(dists <= tolerance)
+    candidates = candidates[np.argsort(dists[candidates])][:MAX_DUPLICATES_REPORTED]
+    return [
+        {
+            "student_id": matcher.ids[i],
+            "name": matcher.names[i],
+            "distance": float(dists[i]),
+        }
+        for i in candidates
+    ]
+
+
+def describe_duplicates(duplicates):
+    return ", ".join(
+        f"{d['name']} ({d['student_id']}, distance {d['distance']:.2f})"
+        for d in duplicates
+    )
+
+
 def choose_camera_index() -> int:
     for idx in [0, 1, 2]:
         cap = cv2.VideoCapture(idx, cv2.CAP_AVFOUNDATION)
@@ -74,14 +154,18 @@ def choose_camera_index() -> int:
     return -1
 
 
-def capture_face_samples(camera_index: int, name: str, student_id: str):
+def capture_face_samples(camera_index: int, name: str, student_id: str, profile):
     cap = cv2.VideoCapture(camera_index, cv2.CAP_AVFOUNDATION)
     if not cap.isOpened():
         print("Could not open camera")
         return None, None
 
     collected_encs = []
-    last_good_frame = None
+    sample_frames = []
+    # detection reads the camera frame as is; only the preview is mirrored.
+    # Both buffers are reused from frame to frame
+    frame_rgb = None
+    display = None
 
     print("\n================= FACE CAPTURE =================")
     print("• Look at the camera with good lighting")
@@ -96,11 +180,18 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             print("Failed to read from camera")
             break
 
-        frame_bgr = cv2.flip(frame_bgr, 1)
         h, w = frame_bgr.shape[:2]
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        boxes = detect_faces(
+            frame_rgb,
+            DETECTION_MODEL,
+            profile["detection_scale"],
+            profile["upsample"],
+        )
+        display = cv2.flip(frame_bgr, 1, dst=display)
 
         cv2.putText(
-            frame_bgr,
+            display,
             f"Samples: {len(collected_encs)}/{SAMPLES_PER_STUDENT}",
             (10, 30),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -109,16 +200,14 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             2,
         )
 
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        boxes = face_recognition.face_locations(frame_rgb, model=DETECTION_MODEL)
-
-        for top, right, bottom, left in boxes:
+        for box in boxes:
+            top, right, bottom, left = mirror_box(box, w)
             color = (0, 255, 0) if len(boxes) == 1 else (0, 165, 255)
-            cv2.rectangle(frame_bgr, (left, top), (right, bottom), color, 2)
+            cv2.rectangle(display, (left, top), (right, bottom), color, 2)
 
         if len(boxes) == 0:
             cv2.putText(
-                frame_bgr,
+                display,
                 "No face detected",
                 (10, 60),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -128,7 +217,7 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             )
         elif len(boxes) > 1:
             cv2.putText(
-                frame_bgr,
+                display,
                 "Multiple faces - only one allowed",
                 (10, 60),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -138,7 +227,7 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             )
         else:
             cv2.putText(
-                frame_bgr,
+                display,
                 "Press SPACE to capture",
                 (10, 60),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -148,7 +237,7 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             )
 
         cv2.putText(
-            frame_bgr,
+            display,
             f"Name: {name}",
             (10, h - 50),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -157,7 +246,7 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             2,
         )
         cv2.putText(
-            frame_bgr,
+            display,
             f"Student ID: {student_id}",
             (10, h - 20),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -166,20 +255,25 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
             2,
         )
 
-        cv2.imshow("Register: Capture face", frame_bgr)
+        cv2.imshow("Register: Capture face", display)
         key = cv2.waitKey(1) & 0xFF
 
         if key == 27:
             collected_encs = []
+            sample_frames = []
             break
 
         if key == 32 and len(boxes) == 1:
-            encs = face_recognition.face_encodings(frame_rgb, boxes)
+            encs = encode_faces(
+                frame_rgb, boxes, profile["landmark_model"], profile["num_jitters"]
+            )
             if len(encs) == 0:
                 print("Could not compute face encoding, try again.")
                 continue
             collected_encs.append(encs[0])
-            last_good_frame = frame_bgr.copy()
+            # unmirrored and without overlays, so every sample can be
+            # re-embedded later
+            sample_frames.append(frame_bgr.copy())
             print(f"Captured sample {len(collected_encs)}")
 
             if len(collected_encs) >= SAMPLES_PER_STUDENT:
@@ -192,33 +286,58 @@ def capture_face_samples(camera_index: int, name: str, student_id: str):
         return None, None
 
     encs_arr = np.vstack(collected_encs)
-    return last_good_frame, encs_arr
-
-
-def save_student_record(name, student_id, email, photo_bgr, encs_arr):
+    return sample_frames, encs_arr
+
+
+def save_student_record(
+    name,
+    student_id,
+    email,
+    sample_frames,
+    encs_arr,
+    department="",
+    model_version=ENCODING_MODEL_VERSION,
+):
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     photo_path = os.path.join(PHOTOS_DIR, f"{student_id}_{ts}.jpg")
-    enc_path = os.path.join(ENCODINGS_DIR, f"{student_id}_{ts}.npy")
 
-    cv2.imwrite(photo_path, photo_bgr)
-    np.save(enc_path, encs_arr)
+    cv2.imwrite(photo_path, sample_frames[0])
+    for number, frame_bgr in enumerate(sample_frames[1:], start=2):
+        cv2.imwrite(
+            os.path.join(PHOTOS_DIR, f"{student_id}_{ts}_{number}.jpg"), frame_bgr
+        )
 
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO students (name, student_id, email, photo_path, encoding_path, date_registered)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT INTO students (name, student_id, email, photo_path, encoding_path, date_registered, department)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     """,
-        (name, student_id, email, photo_path, enc_path, datetime.now().isoformat()),
+        (
+            name,
+            student_id,
+            email,
+            photo_path,
+            None,
+            datetime.now().isoformat(),
+            department or None,
+        ),
     )
+    save_encodings(cur, student_id, encs_arr, model_version)
     conn.commit()
     conn.close()
 
-    return photo_path, enc_path
+    return photo_path
 
 
-def register_student(name: str, student_id: str, email: str = ""):
+def register_student(
+    name: str,
+    student_id: str,
+    email: str = "",
+    department: str = "",
+    confirm_duplicate=None,
+):
     init_database()
 
     if not name or not student_id:
@@ -227,6 +346,9 @@ def register_student(name: str, student_id: str, email: str = ""):
     if student_exists(student_id):
         return False, f"Student with ID {student_id} already exists."
 
+    # warm the duplicate-check gallery while the student is in front of the camera
+    threading.Thread(target=load_duplicate_gallery, daemon=True).start()
+
     cam_idx = choose_camera_index()
     if cam_idx < 0:
         return (
@@ -234,13 +356,29 @@ def register_student(name: str, student_id: str, email: str = ""):
             "No working camera found. Check permissions or close apps using the camera.",
         )
 
-    photo_bgr, encs_arr = capture_face_samples(cam_idx, name, student_id)
+    _, profile = load_profile()
+    sample_frames, encs_arr = capture_face_samples(cam_idx, name, student_id, profile)
 
-    if photo_bgr is None or encs_arr is None:
+    if sample_frames is None or encs_arr is None:
         return False, "Registration cancelled/failed (no samples collected)."
 
-    photo_path, enc_path = save_student_record(
-        name, student_id, email, photo_bgr, encs_arr
+    duplicates = find_duplicate_faces(encs_arr)
+    if duplicates:
+        if confirm_duplicate is None or not confirm_duplicate(duplicates):
+            return (
+                False,
+                "This face is already registered as "
+                f"{describe_duplicates(duplicates)}. Registration not saved.",
+            )
+
+    save_student_record(
+        name,
+        student_id,
+        email,
+        sample_frames,
+        encs_arr,
+        department,
+        profile_version(profile),
     )
 
     return True, f"Successfully registered {name} ({student_id})!"
@@ -253,8 +391,15 @@ def main():
     name = input("Enter student name: ").strip()
     student_id = input("Enter student ID: ").strip().upper()
     email = input("Enter email (optional): ").strip()
+    department = input("Enter department/class (optional): ").strip()
+
+    def confirm_duplicate(duplicates):
+        print(f"\nThis face looks like: {describe_duplicates(duplicates)}")
+        return input("Register anyway? [y/N]: ").strip().lower() == "y"
 
-    success, message = register_student(name, student_id, email)
+    success, message = register_student(
+        name, student_id, email, department, confirm_duplicate
+    )
     if success:
         print(f"\n{message}\n")
     else:
@@ -267,7 +412,7 @@ def create_gui(parent=None):
     else:
         root = tk.Tk()
     root.title("Register New Student")
-    root.geometry("600x650")
+    root.geometry("600x750")
     root.config(bg=BG_PRIMARY)
     root.resizable(False, False)
 
@@ -350,7 +495,20 @@ def create_gui(parent=None):
     email_label.pack(fill="x", pady=(0, 8))
 
     email_entry = tk.Entry(inner_form, **entry_style)
-    email_entry.pack(fill="x", pady=(0, 30), ipady=10)
+    email_entry.pack(fill="x", pady=(0, 20), ipady=10)
+
+    department_label = tk.Label(
+        inner_form,
+        text="Department / Class (Optional)",
+        font=FONT_LABEL,
+        bg=BG_SECONDARY,
+        fg=TEXT_SECONDARY,
+        anchor="w",
+    )
+    department_label.pack(fill="x", pady=(0, 8))
+
+    department_entry = tk.Entry(inner_form, **entry_style)
+    department_entry.pack(fill="x", pady=(0, 30), ipady=10)
 
     status_label = tk.Label(
         inner_form,
@@ -365,6 +523,14 @@ def create_gui(parent=None):
 
     is_processing = [False]
 
+    def confirm_duplicate(duplicates):
+        return messagebox.askyesno(
+            "Possible Duplicate",
+            "This face looks like an already registered student:\n"
+            f"{describe_duplicates(duplicates)}\n\nRegister anyway?",
+            parent=root,
+        )
+
     def on_take_photos():
         if is_processing[0]:
             return
@@ -372,6 +538,7 @@ def create_gui(parent=None):
         name = name_entry.get().strip()
         student_id = student_id_entry.get().strip().upper()
         email = email_entry.get().strip()
+        department = department_entry.get().strip()
 
         if not name or not student_id:
             status_label.config(
@@ -386,13 +553,16 @@ def create_gui(parent=None):
         root.update()
 
         try:
-            success, message = register_student(name, student_id, email)
+            success, message = register_student(
+                name, student_id, email, department, confirm_duplicate
+            )
 
             if success:
                 status_label.config(text=message, fg=SUCCESS_COLOR)
                 name_entry.delete(0, tk.END)
                 student_id_entry.delete(0, tk.END)
                 email_entry.delete(0, tk.END)
+                department_entry.delete(0, tk.END)
                 messagebox.showinfo("Success", message)
             else:
                 status_label.config(text=f"{message}", fg=ERROR_COLOR)
@@ -462,6 +632,7 @@ def create_gui(parent=None):
     name_entry.bind("<Return>", on_enter_key)
     student_id_entry.bind("<Return>", on_enter_key)
     email_entry.bind("<Return>", on_enter_key)
+    department_entry.bind("<Return>", on_enter_key)
 
     name_entry.focus()
 
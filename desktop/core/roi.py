@@ -0,0 +1,107 @@
+# each track's last box is searched again padded by this fraction of its size
+# on every side, enough for a face moving at walking pace between detections
+ROI_PADDING = 0.5
+# students walk into the picture from the sides, so strips this share of the
+# frame wide along the left and right edges are always searched
+ROI_EDGE_FRACTION = 0.15
+# every Nth detection scans the whole frame, for faces that turn towards the
+# camera away from the edges or grow out of a distance too far to detect
+ROI_FULL_SCAN_EVERY = 10
+# regions covering more of the frame than this save too little to bother
+ROI_MAX_COVERAGE = 0.6
+
+
+def region_area(region):
+    top, right, bottom, left = region
+    return max(bottom - top, 0) * max(right - left, 0)
+
+
+def _overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]
+
+
+def merge_regions(regions):
+    # overlapping regions are replaced by their bounding box until none
+    # overlap, so faces close together are searched once
+    merged = list(regions)
+    i = 0
+    while i < len(merged):
+        for j in range(i + 1, len(merged)):
+            if _overlap(merged[i], merged[j]):
+                a, b = merged[i], merged.pop(j)
+                merged[i] = (
+                    min(a[0], b[0]),
+                    max(a[1], b[1]),
+                    max(a[2], b[2]),
+                    min(a[3], b[3]),
+                )
+                i = 0
+                break
+        else:
+            i += 1
+    return merged
+
+
+def track_regions(frame_shape, boxes, padding=ROI_PADDING, edge=ROI_EDGE_FRACTION):
+    # regions use the (top, right, bottom, left) order of face boxes, with
+    # right and bottom exclusive. The edge strips are kept apart from the
+    # track regions: merged, a face near the edge would grow the strip
+    h, w = frame_shape[:2]
+    regions = []
+    for top, right, bottom, left in boxes:
+        pad_x = int((right - left) * padding)
+        pad_y = int((bottom - top) * padding)
+        regions.append(
+            (
+                max(top - pad_y, 0),
+                min(right + pad_x, w),
+                min(bottom + pad_y, h),
+                max(left - pad_x, 0),
+            )
+        )
+    strip = int(w * edge)
+    return merge_regions(regions) + [(0, strip, h, 0), (0, w, h, w - strip)]
+
+
+class RegionPlanner:
+    def __init__(self, full_every=ROI_FULL_SCAN_EVERY, max_coverage=ROI_MAX_COVERAGE):
+        self.full_every = full_every
+        self.max_coverage = max_coverage
+        self._since_full = None
+        self.full_scans = 0
+        self.region_scans = 0
+        # share of the frame searched, summed over all detections
+        self.coverage = 0.0
+
+    def reset(self):
+        # the next detection scans the whole frame
+        self._since_full = None
+
+    def plan(self, frame_shape, boxes):
+        # returns the regions to search, or None to search the whole frame
+        regions = None
+        if self._since_full is not None and self._since_full + 1 < self.full_every:
+            regions = track_regions(frame_shape, boxes)
+            coverage = sum(region_area(r) for r in regions) / float(
+                frame_shape[0] * frame_shape[1]
+            )
+            if coverage > self.max_coverage:
+                regions = None
+
+        if regions is None:
+            self._since_full = 0
+            self.full_scans += 1
+            self.coverage += 1.0
+        else:
+            self._since_full += 1
+            self.region_scans += 1
+            self.coverage += coverage
+        return regions
+
+    def stats(self):
+        scans = self.full_scans + self.region_scans
+        return {
+            "full_scans": self.full_scans,
+            "region_scans": self.region_scans,
+            "mean_coverage": self.coverage / scans if scans else 1.0,
+        }
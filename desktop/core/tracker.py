@@ -0,0 +1,156 @@
+import math
+import time
+
+# a detection continues a track when their boxes overlap at least this much,
+# or failing that, when its centre moved less than this fraction of the
+# track's box size since the last frame
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_MAX_CENTROID_SHIFT = 0.5
+# frames a track survives without a matching detection before it is dropped
+TRACK_MAX_MISSED = 5
+# consecutive matches to the same student before a track's identity is fixed
+TRACK_CONFIRM_MATCHES = 2
+
+
+def box_iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    inter = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_shift(track_box, box):
+    top, right, bottom, left = track_box
+    size = max(right - left, bottom - top, 1)
+    dx = (box[1] + box[3] - right - left) / 2.0
+    dy = (box[0] + box[2] - top - bottom) / 2.0
+    return math.hypot(dx, dy) / size
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.started_at = time.monotonic()
+        self.missed = 0
+        # frames seen since this track's face was last encoded
+        self.waiting = 0
+        self.candidate = None
+        self.matches = 0
+        self.student_id = None
+        self.name = None
+        self.label = "Unrecognized"
+        self.color = (0, 0, 255)
+
+    @property
+    def confirmed(self):
+        return self.student_id is not None
+
+    def observe(self, student_id, name):
+        # returns True once the same student has matched often enough
+        self.waiting = 0
+        if student_id is None:
+            self.candidate, self.matches = None, 0
+            self.label, self.color = "Unrecognized", (0, 0, 255)
+            return False
+        if self.candidate == student_id:
+            self.matches += 1
+        else:
+            self.candidate, self.matches = student_id, 1
+        self.label, self.color = f"{name}?", (128, 128, 128)
+        return self.matches >= TRACK_CONFIRM_MATCHES
+
+    def identify(self, student_id, name, label, color):
+        self.student_id = student_id
+        self.name = name
+        self.label = label
+        self.color = color
+
+
+class FaceTracker:
+    def __init__(self, max_missed=TRACK_MAX_MISSED):
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_id = 1
+        self.started = 0
+        self.lost = 0
+
+    def _associate(self, boxes):
+        assigned = [None] * len(boxes)
+        taken = set()
+        overlaps = sorted(
+            (
+                (box_iou(track.box, box), t, b)
+                for t, track in enumerate(self.tracks)
+                for b, box in enumerate(boxes)
+            ),
+            reverse=True,
+        )
+        for iou, t, b in overlaps:
+            if iou < TRACK_IOU_THRESHOLD:
+                break
+            if t not in taken and assigned[b] is None:
+                assigned[b] = self.tracks[t]
+                taken.add(t)
+
+        # fast movers can leave no overlap with their previous box
+        shifts = sorted(
+            (centroid_shift(track.box, box), t, b)
+            for t, track in enumerate(self.tracks)
+            if t not in taken
+            for b, box in enumerate(boxes)
+            if assigned[b] is None
+        )
+        for shift, t, b in shifts:
+            if shift > TRACK_MAX_CENTROID_SHIFT:
+                break
+            if t not in taken and assigned[b] is None:
+                assigned[b] = self.tracks[t]
+                taken.add(t)
+        return assigned
+
+    def update(self, boxes):
+        assigned = self._associate(boxes)
+        for track in self.tracks:
+            track.missed += 1
+        for b, box in enumerate(boxes):
+            if assigned[b] is None:
+                assigned[b] = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(assigned[b])
+                self.started += 1
+            assigned[b].box = box
+            assigned[b].missed = 0
+            assigned[b].waiting += 1
+
+        kept = [track for track in self.tracks if track.missed <= self.max_missed]
+        self.lost += len(self.tracks) - len(kept)
+        self.tracks = kept
+        return assigned
+
+    def clear(self):
+        # tracks are dropped without waiting for missed detections, e.g. once
+        # nobody has been seen for long enough that a face reappearing in the
+        # same place can't be assumed to be the same student
+        self.lost += len(self.tracks)
+        self.tracks = []
+
+    def confirmed_boxes(self):
+        return [track.box for track in self.tracks if track.confirmed]
+
+    def waiting_boxes(self):
+        return [
+            (track.box, track.waiting)
+            for track in self.visible()
+            if not track.confirmed
+        ]
+
+    def visible(self):
+        return [track for track in self.tracks if track.missed == 0]
+
+    def has_unconfirmed(self):
+        return any(not track.confirmed for track in self.visible())
@@ -1,3 +1,4 @@
+import multiprocessing
 import tkinter as tk
 from tkinter import messagebox
 import subprocess
@@ -58,54 +59,6 @@ def on_closing():
     root.destroy()
 
 
-login = LoginView(None)
-if not login.show():
-    sys.exit()
-
-logged_in_username = login.username
-
-root = tk.Tk()
-root.title("Face Attendance System")
-root.config(bg=BG_PRIMARY)
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
-if os.path.exists(ICON_PATH):
-    icon = tk.PhotoImage(file=ICON_PATH)
-    root.iconphoto(False, icon)
-
-
-main_container = tk.Frame(root, bg=BG_PRIMARY)
-main_container.pack(expand=True, fill="both", padx=40, pady=40)
-
-header_frame = tk.Frame(main_container, bg=BG_PRIMARY)
-header_frame.pack(fill="x", pady=(0, 50))
-
-title_container = tk.Frame(header_frame, bg=BG_PRIMARY)
-title_container.pack()
-
-
-title = tk.Label(
-    title_container,
-    text="Face Attendance System",
-    font=FONT_TITLE,
-    bg=BG_PRIMARY,
-    fg=TEXT_PRIMARY,
-)
-title.pack(side="left")
-
-subtitle = tk.Label(
-    header_frame,
-    text="AI-Powered Smart Attendance Tracking",
-    font=FONT_SUBTITLE,
-    bg=BG_PRIMARY,
-    fg=TEXT_MUTED,
-)
-subtitle.pack(pady=(15, 0))
-
-cards_container = tk.Frame(main_container, bg=BG_PRIMARY)
-cards_container.pack(expand=True, fill="both")
-
-
 def create_feature_card(
     parent, icon, title_text, description, button_text, command, accent_color
 ):
@@ -197,49 +150,6 @@ def create_feature_card(
     return card
 
 
-register_card = create_feature_card(
-    cards_container,
-    "+",
-    "Register Student",
-    "Add new students to the system by capturing their facial features.",
-    "Register New",
-    run_register,
-    ACCENT_BLUE,
-)
-
-attendance_card = create_feature_card(
-    cards_container,
-    "O",
-    "Mark Attendance",
-    "Start the attendance session to automatically detect and record student presence using face recognition.",
-    "Start Session",
-    run_attendance,
-    ACCENT_GREEN,
-)
-
-dashboard_card = create_feature_card(
-    cards_container,
-    "◐",
-    "Web Dashboard",
-    "Open the web dashboard to view attendance reports, manage students, and export data.",
-    "Open Web Dashboard",
-    open_dashboard,
-    ACCENT_BLUE,
-)
-
-footer_frame = tk.Frame(root, bg=BG_PRIMARY)
-footer_frame.pack(side="bottom", fill="x", pady=(0, 20))
-
-footer_content = tk.Frame(footer_frame, bg=BG_PRIMARY)
-footer_content.pack()
-
-footer_left = tk.Frame(footer_content, bg=BG_PRIMARY)
-footer_left.pack(side="left", padx=20)
-
-footer_right = tk.Frame(footer_content, bg=BG_PRIMARY)
-footer_right.pack(side="right", padx=20)
-
-
 def open_github(event):
     webbrowser.open("https://github.com/Saleem-devs")
 
@@ -248,44 +158,135 @@ def open_change_password_link(event):
     open_change_password()
 
 
-footer_text_1 = tk.Label(
-    footer_left,
-    text="Developed by",
-    font=FONT_FOOTER,
-    bg=BG_PRIMARY,
-    fg=TEXT_FOOTER,
-)
-footer_text_1.pack(side="left")
-
-seleem_link = tk.Label(
-    footer_left,
-    text="Seleem",
-    font=(FONT_FOOTER[0], FONT_FOOTER[1], "underline"),
-    bg=BG_PRIMARY,
-    fg=ACCENT_BLUE,
-    cursor="hand2",
-)
-seleem_link.pack(side="left")
-seleem_link.bind("<Button-1>", open_github)
-seleem_link.bind("<Enter>", lambda e: seleem_link.config(fg="#93C5FD"))
-seleem_link.bind("<Leave>", lambda e: seleem_link.config(fg=ACCENT_BLUE))
-
-change_password_link = tk.Label(
-    footer_right,
-    text="Change Password",
-    font=(FONT_FOOTER[0], FONT_FOOTER[1], "underline"),
-    bg=BG_PRIMARY,
-    fg=ACCENT_BLUE,
-    cursor="hand2",
-)
-change_password_link.pack(side="left")
-change_password_link.bind("<Button-1>", open_change_password_link)
-change_password_link.bind(
-    "<Enter>", lambda e: change_password_link.config(fg="#93C5FD")
-)
-change_password_link.bind(
-    "<Leave>", lambda e: change_password_link.config(fg=ACCENT_BLUE)
-)
-
-
-root.mainloop()
+if __name__ == "__main__":
+    # spawned recognition workers re-import this module; only the real
+    # entry point may open windows
+    multiprocessing.freeze_support()
+
+    login = LoginView(None)
+    if not login.show():
+        sys.exit()
+
+    logged_in_username = login.username
+
+    root = tk.Tk()
+    root.title("Face Attendance System")
+    root.config(bg=BG_PRIMARY)
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+
+    if os.path.exists(ICON_PATH):
+        icon = tk.PhotoImage(file=ICON_PATH)
+        root.iconphoto(False, icon)
+
+    main_container = tk.Frame(root, bg=BG_PRIMARY)
+    main_container.pack(expand=True, fill="both", padx=40, pady=40)
+
+    header_frame = tk.Frame(main_container, bg=BG_PRIMARY)
+    header_frame.pack(fill="x", pady=(0, 50))
+
+    title_container = tk.Frame(header_frame, bg=BG_PRIMARY)
+    title_container.pack()
+
+    title = tk.Label(
+        title_container,
+        text="Face Attendance System",
+        font=FONT_TITLE,
+        bg=BG_PRIMARY,
+        fg=TEXT_PRIMARY,
+    )
+    title.pack(side="left")
+
+    subtitle = tk.Label(
+        header_frame,
+        text="AI-Powered Smart Attendance Tracking",
+        font=FONT_SUBTITLE,
+        bg=BG_PRIMARY,
+        fg=TEXT_MUTED,
+    )
+    subtitle.pack(pady=(15, 0))
+
+    cards_container = tk.Frame(main_container, bg=BG_PRIMARY)
+    cards_container.pack(expand=True, fill="both")
+
+    register_card = create_feature_card(
+        cards_container,
+        "+",
+        "Register Student",
+        "Add new students to the system by capturing their facial features.",
+        "Register New",
+        run_register,
+        ACCENT_BLUE,
+    )
+
+    attendance_card = create_feature_card(
+        cards_container,
+        "O",
+        "Mark Attendance",
+        "Start the attendance session to automatically detect and record student presence using face recognition.",
+        "Start Session",
+        run_attendance,
+        ACCENT_GREEN,
+    )
+
+    dashboard_card = create_feature_card(
+        cards_container,
+        "◐",
+        "Web Dashboard",
+        "Open the web dashboard to view attendance reports, manage students, and export data.",
+        "Open Web Dashboard",
+        open_dashboard,
+        ACCENT_BLUE,
+    )
+
+    footer_frame = tk.Frame(root, bg=BG_PRIMARY)
+    footer_frame.pack(side="bottom", fill="x", pady=(0, 20))
+
+    footer_content = tk.Frame(footer_frame, bg=BG_PRIMARY)
+    footer_content.pack()
+
+    footer_left = tk.Frame(footer_content, bg=BG_PRIMARY)
+    footer_left.pack(side="left", padx=20)
+
+    footer_right = tk.Frame(footer_content, bg=BG_PRIMARY)
+    footer_right.pack(side="right", padx=20)
+
+    footer_text_1 = tk.Label(
+        footer_left,
+        text="Developed by",
+        font=FONT_FOOTER,
+        bg=BG_PRIMARY,
+        fg=TEXT_FOOTER,
+    )
+    footer_text_1.pack(side="left")
+
+    seleem_link = tk.Label(
+        footer_left,
+        text="Seleem",
+        font=(FONT_FOOTER[0], FONT_FOOTER[1], "underline"),
+        bg=BG_PRIMARY,
+        fg=ACCENT_BLUE,
+        cursor="hand2",
+    )
+    seleem_link.pack(side="left")
+    seleem_link.bind("<Button-1>", open_github)
+    seleem_link.bind("<Enter>", lambda e: seleem_link.config(fg="#93C5FD"))
+    seleem_link.bind("<Leave>", lambda e: seleem_link.config(fg=ACCENT_BLUE))
+
+    change_password_link = tk.Label(
+        footer_right,
+        text="Change Password",
+        font=(FONT_FOOTER[0], FONT_FOOTER[1], "underline"),
+        bg=BG_PRIMARY,
+        fg=ACCENT_BLUE,
+        cursor="hand2",
+    )
+    change_password_link.pack(side="left")
+    change_password_link.bind("<Button-1>", open_change_password_link)
+    change_password_link.bind(
+        "<Enter>", lambda e: change_password_link.config(fg="#93C5FD")
+    )
+    change_password_link.bind(
+        "<Leave>", lambda e: change_password_link.config(fg=ACCENT_BLUE)
+    )
+
+    root.mainloop()